@@ -0,0 +1,107 @@
+"""Selection of generated API families.
+
+Init functions, constructors and prototypes are always generated. Other
+functions are grouped in families that can be turned off globally or
+per top level type:
+
+- validate: Validate<Type>(value), IsValid();
+- validate_json: Validate<Type>(node), IsJsonValid();
+- to_json: <Type>ToJson, ToJson(), ToString(), SaveToFile();
+- from_json: JsonTo<Type>, FromJson(), FromString(), FromBuffer(),
+  LoadFromFile(), FromDocument();
+- compare: operator==, operator!=, Diff<Type>;
+- hash: Hash<Type>, Hash();
+- paths: dotted path accessors of top level objects, json and typed.
+
+"""
+
+import configen.validate as cv
+
+FAMILIES = ('validate', 'validate_json', 'to_json', 'from_json', 'compare',
+            'hash', 'paths')
+
+# family -> families whose functions it calls
+DEPENDENCIES = {'from_json': ('validate_json',),
+                'to_json': ('compare',), # sparse output compares members
+                'paths': ('to_json', 'from_json', 'validate_json',
+                          'validate')}
+
+
+def parse_families(text):
+    """Convert comma separated family names ("all" for every) to list."""
+    families = [name.strip() for name in text.split(',') if name.strip()]
+    if families == ['all']:
+        return list(FAMILIES)
+    check_families(families)
+    return families
+
+
+def check_families(families):
+    """Raise ValueError if some of the family names are unknown."""
+    unknown = set(families) - set(FAMILIES)
+    if unknown:
+        raise ValueError('unknown API families: ' + ', '.join(sorted(unknown))
+                         + ', known are: ' + ', '.join(FAMILIES))
+
+
+def closure(families):
+    """Return set of families with all families they depend on."""
+    result = set()
+    pending = list(families)
+    while pending:
+        family = pending.pop()
+        if family not in result:
+            result.add(family)
+            pending.extend(DEPENDENCIES.get(family, ()))
+    return result
+
+
+def _required_families(schema, required):
+    """Collect families needed by the schema itself.
+
+    Lazy members convert their node on first access and array defaults
+    are parsed from json, both need JsonTo.
+
+    """
+    if isinstance(schema, dict):
+        if schema.get('lazy') or (schema.get('type') == 'array'
+                                  and 'default' in schema):
+            required.add('from_json')
+        for value in schema.values():
+            _required_families(value, required)
+    return required
+
+
+def resolve(schema, api=None, type_api=None):
+    """Return dict top level type name -> sorted list of families.
+
+    api is the list of families of every type (None for all), type_api
+    a dict type name -> list that overrides it for some types. A type
+    referenced by other types gets their families too, references to
+    library types are not followed.
+
+    """
+    type_api = type_api if type_api is not None else {}
+    unknown = set(type_api) - set(schema)
+    if unknown:
+        raise ValueError('unknown types: ' + ', '.join(sorted(unknown)))
+    for selected in [api or []] + list(type_api.values()):
+        check_families(selected)
+    families = {}
+    for name, object_schema in schema.items():
+        selected = type_api.get(name, api if api is not None else FAMILIES)
+        families[name] = closure(
+            set(selected) | _required_families(object_schema, set()))
+    references = {name: cv.collect_references(object_schema, set())
+                  & set(schema)
+                  for name, object_schema in schema.items()}
+    changed = True
+    while changed:
+        changed = False
+        for name in schema:
+            for reference in references[name]:
+                if not families[name] <= families[reference]:
+                    families[reference] = closure(families[reference]
+                                                  | families[name])
+                    changed = True
+    return {name: sorted(selected) for name, selected in families.items()}
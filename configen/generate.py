@@ -3,7 +3,9 @@
 import json
 import sys
 
+import configen.api as ca
 import configen.generator_cpp as cpp
+import configen.profiling as cp
 
 
 _LANGUAGE_MODULE_DICT = {'c++': cpp}
@@ -13,29 +15,95 @@ def write_files(code, language, filename):
     generator_module = _LANGUAGE_MODULE_DICT[language]
     generator_module.write_files(code, filename)
 
-def convert_json(json_schema, language, **kwargs):
+def write_changed_files(code, language, filename):
+    """Write only files whose content differs, return their names."""
+    generator_module = _LANGUAGE_MODULE_DICT[language]
+    written = []
+    for output_filename, content in sorted(
+            generator_module.output_files(code, filename).items()):
+        try:
+            with open(output_filename, 'r') as existing:
+                if existing.read() == content:
+                    continue
+        except IOError:
+            pass
+        with open(output_filename, 'w') as output:
+            output.write(content)
+        written.append(output_filename)
+    return written
+
+def convert_json(json_schema, language, profile=None, **kwargs):
     """Convert json to dict and call actual generator function."""
     try:
-        json_data = json.loads(json_schema)
+        with cp.phase(profile, 'load json'):
+            json_data = json.loads(json_schema)
     except Exception as e:
         print("Error: failed to parse json")
         print(str(e))
         sys.exit(1)
-    return convert_schema_to_language(json_data, language, **kwargs)
+    return convert_schema_to_language(json_data, language, profile=profile,
+                                      **kwargs)
+
+
+def schema_cache_key(language, schema, options=None):
+    """Return key that identifies code generated for the schema subtree."""
+    return language + ':' + json.dumps([schema, options], sort_keys=True)
+
 
+def resolve_type_options(schema, options=None):
+    """Return dict top level type name -> options used to convert it."""
+    type_options = {name: options for name in schema}
+    if options and (options.get('api') is not None
+                    or options.get('type_api')):
+        for name, families in ca.resolve(schema, options.get('api'),
+                                         options.get('type_api')).items():
+            type_options[name] = dict(options, api=families)
+            type_options[name].pop('type_api', None)
+    return type_options
 
-def convert_schema_to_language(schema, language, **kwargs):
-    """Get generators for particular language, start and end processing."""
+
+def convert_schema_to_language(schema, language, cache=None, options=None,
+                               profile=None, **kwargs):
+    """Get generators for particular language, start and end processing.
+
+    options is a dict of generator options passed to every maker, e.g.
+    {'instrument': True}. Options 'api' (list of API families) and
+    'type_api' (dict type name -> list) are resolved by
+    configen.api.resolve into 'api' of every type. If cache dict is
+    given code for top level types is looked up there by
+    schema_cache_key and newly generated
+    code is added to it. If profile (configen.profiling.Profile) is
+    given phase timings and code sizes are recorded in it.
+
+    """
     generator_module = _LANGUAGE_MODULE_DICT[language]
     name_code_dict = {}
+    type_options = resolve_type_options(schema, options)
     for object_name, object_schema in schema.items():
-        name_code_dict[object_name] = convert_schema(generator_module, 
-                                                     object_schema)
-    return generator_module.generate_files(name_code_dict, **kwargs)
+        object_options = type_options[object_name]
+        with cp.phase(profile, 'convert_schema ' + object_name):
+            if cache is None:
+                name_code_dict[object_name] = convert_schema(
+                    generator_module, object_schema, object_options)
+                continue
+            key = schema_cache_key(language, object_schema, object_options)
+            if key not in cache:
+                cache[key] = convert_schema(generator_module, object_schema,
+                                            object_options)
+            name_code_dict[object_name] = cache[key]
+    return generator_module.generate_files(name_code_dict, options=options,
+                                           profile=profile, **kwargs)
 
 _SIMPLE_TYPES = ['bool', 'integer', 'number', 'string']
 
-def convert_schema(generator_module, schema):
+def convert_member(generator_module, schema, options=None):
+    """Convert object member, "lazy": true members are converted on access."""
+    code = convert_schema(generator_module, schema, options)
+    if schema.get('lazy') and code is not None:
+        return generator_module.generate_lazy(code, schema, options)
+    return code
+
+def convert_schema(generator_module, schema, options=None):
     """Walk schema tree calling appropriate makers for generating code.
 
     The code and state is stored in a dictionary. Makers is a
@@ -43,19 +111,23 @@ def convert_schema(generator_module, schema):
     walking.
 
     """
+    options = options if options is not None else {}
     if 'type' in schema:
         if schema['type'] in _SIMPLE_TYPES:
-            return generator_module.generate_variable(schema)
+            return generator_module.generate_variable(schema, options)
         if schema['type'] == 'object':
             members = {
-                member_name: convert_schema(generator_module, member_schema)
+                member_name: convert_member(generator_module, member_schema,
+                                            options)
                        for member_name, member_schema in schema['properties'].items()}
-            return generator_module.generate_object(members)
+            return generator_module.generate_object(members, options)
         if schema['type'] == 'array':
-            array_element = convert_schema(generator_module, schema['items'])
-            return generator_module.generate_array(array_element, schema)
+            array_element = convert_schema(generator_module, schema['items'],
+                                           options)
+            return generator_module.generate_array(array_element, schema,
+                                                   options)
     if '$ref' in schema:
-        return generator_module.generate_reference(schema)
+        return generator_module.generate_reference(schema, options)
     # unknown type
     return None
 
@@ -1,23 +1,46 @@
 from datetime import datetime
 import os.path
 from pprint import pprint
+import configen.library as cl
 import configen.utils as cu
 import configen.parts_cpp as cpp
+import configen.profiling as cp
 
 _FILE_FORMAT_DICT = {'lb': '{', 'rb': '}', 'namespace': '',
                      'function_prefix': ''}
 
 def generate_header(name_code_dict, namespace=None, includes=None, 
-                    filename=None):
+                    filename=None, timestamp=None, options=None):
+    options = options if options is not None else {}
     header = []
-    guard_parts = [filename, datetime.now().strftime('%y_%m_%d_%H_%M')]
+    timestamp = timestamp if timestamp is not None else datetime.now()
+    guard_parts = [filename, timestamp.strftime('%y_%m_%d_%H_%M')]
     # headers start
     header.extend(cpp.header_guard_front(guard_parts))
     for include_file in includes:
         header.extend(cpp.include(include_file))
+    for library in options.get('libraries', []):
+        header.extend(cpp.include(library['header']))
+    if options.get('snapshots'):
+        header.extend(cpp.snapshot_header_includes())
     header.extend(cpp.namespace_begin(namespace) + ['']
                   + cpp.json_to_string_declaration()
-                  + cpp.string_to_json_declaration() + [''])
+                  + cpp.string_to_json_declaration()
+                  + cpp.file_io_declaration()
+                  + cu.rewrite(cpp.records_declaration(), _FILE_FORMAT_DICT)
+                  + cu.rewrite(cpp.lazy_declaration(), _FILE_FORMAT_DICT)
+                  + cu.rewrite(cpp.field_accessor_declaration(),
+                               _FILE_FORMAT_DICT)
+                  + cu.rewrite(cpp.prototype_tag_declaration(),
+                               _FILE_FORMAT_DICT)
+                  + cu.rewrite(cpp.hash_helpers_declaration(),
+                               _FILE_FORMAT_DICT) + [''])
+    if options.get('instrument'):
+        header.extend(cu.rewrite(cpp.instrumentation_declaration(),
+                                 _FILE_FORMAT_DICT) + [''])
+    if options.get('snapshots'):
+        header.extend(cu.rewrite(cpp.snapshot_declaration(),
+                                 _FILE_FORMAT_DICT) + [''])
     # header typedefs and 
     for name, code in name_code_dict.items():
         format_dict = {}
@@ -33,23 +56,53 @@ def generate_header(name_code_dict, namespace=None, includes=None,
         format_dict['name'] = name
         for template in code.get('declarations', []):
             header.append(template.format_map(format_dict))
+    # dotted path accessors of top level objects
+    for name, code in name_code_dict.items():
+        if _has_paths(code):
+            header.extend(cu.rewrite(cpp.path_table_declaration(),
+                                     {'typename': cu.to_camel_case(name)}))
+    # snapshot holders of top level objects
+    if options.get('snapshots'):
+        for name, code in name_code_dict.items():
+            if code.get('kind') == 'object':
+                header.extend(cu.rewrite(
+                    cpp.snapshot_holder_declaration(),
+                    {'typename': cu.to_camel_case(name)}))
     # header end
     header.extend(cpp.namespace_end(namespace))
     header.extend(cpp.header_guard_back(guard_parts))
     return header
 
 def generate_source(name_code_dict, namespace=None, includes=None, 
-                    filename=None, include_path=None):
+                    filename=None, include_path=None, options=None):
+    options = options if options is not None else {}
     source = []
     # source start
     source.extend(cpp.include(filename + '.h', include_path))
     for include_file in includes:
         source.extend(cpp.include(include_file))
+    source.extend(cpp.file_io_includes())
+    if options.get('snapshots'):
+        source.extend(cpp.snapshot_source_includes())
     source.extend(cpp.namespace_begin(namespace) + ['']
                   + cu.rewrite(cpp.json_to_string_definition(),
                                _FILE_FORMAT_DICT)
                   + cu.rewrite(cpp.string_to_json_definition(),
+                               _FILE_FORMAT_DICT)
+                  + cu.rewrite(cpp.file_io_definition(), _FILE_FORMAT_DICT)
+                  + cu.rewrite(cpp.records_definition(), _FILE_FORMAT_DICT)
+                  + cu.rewrite(cpp.hash_helpers_definition(),
+                               _FILE_FORMAT_DICT)
+                  + cu.rewrite(cpp.lazy_helpers_definition(),
+                               _FILE_FORMAT_DICT)
+                  + cu.rewrite(cpp.field_accessor_definition(),
                                _FILE_FORMAT_DICT))
+    if options.get('instrument'):
+        source.extend(cu.rewrite(cpp.instrumentation_definition(),
+                                 _FILE_FORMAT_DICT))
+    if options.get('snapshots'):
+        source.extend(cu.rewrite(cpp.snapshot_definition(),
+                                 _FILE_FORMAT_DICT))
     # definitions
     for name, code in name_code_dict.items():
         format_dict = {}
@@ -59,31 +112,121 @@ def generate_source(name_code_dict, namespace=None, includes=None,
         format_dict['name_array'] = '"' + name + '"'
         for template in code.get('definitions', []):
             source.append(template.format_map(format_dict))
+        if _has_paths(code):
+            source.extend(_path_table_definition(name, code, name_code_dict,
+                                                format_dict))
     # source end
     source.extend(cpp.namespace_end(namespace))
     return source
 
-def generate_variable(schema):
-    code_parts = {}
+def _has_paths(code):
+    """Check if dotted path accessors are generated for top level type."""
+    return code.get('kind') == 'object' and (code.get('api') is None
+                                             or 'paths' in code['api'])
+
+def _path_table_definition(name, code, name_code_dict, format_dict):
+    """Return formatted path accessors and table of a top level object."""
+    paths = top_level_paths(name, code, name_code_dict)
+    seeds, slots = cu.perfect_hash([path['path'] for path in paths])
+    return cu.rewrite(cpp.path_table_definition(paths, seeds, slots),
+                      format_dict)
+
+def top_level_paths(name, code, name_code_dict=None):
+    """Return dotted paths of a top level object and all its members.
+
+    Members that reference a type of name_code_dict get its kind and
+    the members of a referenced object are added under the member path.
+    Types of libraries are not looked into.
+
+    """
+    format_dict = {}
+    format_dict.update(_FILE_FORMAT_DICT)
+    format_dict['typename'] = cu.to_camel_case(name)
+    paths = [{'path': name, 'access': None, 'namespace': '',
+              'typename': format_dict['typename'], 'kind': code.get('kind')}]
+    for path in code.get('paths', []):
+        entry = {'path': name + '.' + path['path'],
+                 'access': path['access'],
+                 'namespace': path['namespace'].format_map(format_dict),
+                 'typename': path['typename'],
+                 'kind': path.get('kind')}
+        paths.append(entry)
+        if path.get('reference') is not None and name_code_dict:
+            paths.extend(_referenced_paths(entry, path['reference'],
+                                           name_code_dict))
+    return paths
+
+def _referenced_paths(entry, reference, name_code_dict):
+    """Set kind of entry and return paths of members of referenced type."""
+    top_name = reference.split('.')[0]
+    if top_name not in name_code_dict:
+        return []
+    referenced = top_level_paths(top_name, name_code_dict[top_name],
+                                 name_code_dict)
+    target = [path for path in referenced if path['path'] == reference]
+    if not target:
+        return []
+    entry['kind'] = target[0]['kind']
+    access_prefix = (target[0]['access'] + '.'
+                     if target[0]['access'] is not None else '')
+    paths = []
+    for path in referenced:
+        if path['path'].startswith(reference + '.'):
+            paths.append(dict(
+                path, path=entry['path'] + path['path'][len(reference):],
+                access=(entry['access'] + '.'
+                        + path['access'][len(access_prefix):])))
+    return paths
+
+def _api_families(options):
+    """Return set of generated API families, None if all are generated."""
+    if options.get('api') is None:
+        return None
+    return set(options['api'])
+
+def _with_family(families, family, parts):
+    """Return parts if the family is generated, empty list otherwise."""
+    if families is None or family in families:
+        return parts
+    return []
+
+def generate_variable(schema, options=None):
+    options = options if options is not None else {}
+    families = _api_families(options)
+    code_parts = {'kind': schema['type']}
     code_parts['predefine'] = [('typedef ' + cpp.to_cpp_type(schema) 
                                + ' {typename};')]
     code_parts['declarations'] = ([''] + cpp.init_declaration()
-                                  + cpp.validate_declaration() 
-                                  + cpp.conversion_declaration())
-    code_parts['definitions'] = (cpp.variable_init_definition(schema)
-                                 + cpp.variable_validate_definition(schema)
-                                 + cpp.variable_conversion_definition(schema))
+                                  + cpp.validate_declaration(families)
+                                  + cpp.conversion_declaration(families)
+                                  + _with_family(families, 'hash',
+                                                 cpp.hash_declaration()))
+    code_parts['definitions'] = (
+        cpp.variable_init_definition(schema)
+        + cpp.variable_validate_definition(schema, families)
+        + cpp.variable_conversion_definition(schema, families)
+        + _with_family(families, 'hash', cpp.variable_hash_definition(schema)))
+    if options.get('instrument'):
+        code_parts['definitions'] = cpp.instrument_definitions(
+            code_parts['definitions'])
     return code_parts
 
-def generate_object(members):
-    code_parts = {'predefine': ['struct {typename};'],
+def generate_object(members, options=None):
+    options = options if options is not None else {}
+    families = _api_families(options)
+    code_parts = {'kind': 'object',
+                  'predefine': ['struct {typename};'],
                   'declarations': 
-                  (cpp.init_declaration() + cpp.validate_declaration()
-                   + cpp.conversion_declaration() 
+                  (cpp.init_declaration() + cpp.validate_declaration(families)
+                   + cpp.conversion_declaration(families)
+                   + _with_family(families, 'compare', cpp.diff_declaration(members))
+                   + _with_family(families, 'hash', cpp.hash_declaration())
                    + ['', 'struct {typename} {lb}',
                       cpp.indent('static const std::size_t kNamesLength;'),
-                      cpp.indent('static const char * const kNames[];'),
-                      cpp.indent('bool (*pre_update)(const {typename} &current_value,'
+                      cpp.indent('static const char * const kNames[];')]
+                   + _with_family(families, 'compare', cpp.indent(
+                       cpp.object_diff_bits_declaration(members)))
+                   + [cpp.indent('bool (*pre_update)(const {typename} &current_value,'
                                  ' const {typename} &new_value);')]),
                   'definitions': []}
     # lists to collect code parts
@@ -93,6 +236,7 @@ def generate_object(members):
     function_definitions = []
     member_init = [] # accumulate calls to member init functions
     member_validate = [] # accumulate calls to member validate functions
+    paths = [] # dotted paths of members and members of member objects
     for member_name, member_code in members.items():
         if 'typename' in member_code:
             member_type = member_code['typename'] 
@@ -106,7 +250,8 @@ def generate_object(members):
         member_defines.extend(cu.rewrite(member_code['predefine'],
                                          member_format_dict))
         # member variables
-        member_declarations.append('{0} {1};'.format(member_type, member_name))
+        member_declarations.append('{0} {1};'.format(
+            member_code.get('cpp_type', member_type), member_name))
         # member declarations for init and validate
         function_declarations.extend(cu.rewrite(member_code['declarations'],
                                                 member_format_dict))
@@ -120,16 +265,38 @@ def generate_object(members):
                                       calls_format_dict))
         member_validate.extend(cu.rewrite(cpp.validate_call(member_code),
                                calls_format_dict))
+        paths.append({'path': member_name, 'access': member_name,
+                      'namespace': member_code.get('namespace',
+                                                   '{namespace}{typename}::'),
+                      'typename': member_type,
+                      'kind': member_code.get('kind'),
+                      'reference': member_code.get('reference')})
+        for path in member_code.get('paths', []):
+            paths.append(dict(
+                path, path=member_name + '.' + path['path'],
+                access=member_name + '.' + path['access'],
+                namespace=path['namespace'].format_map(member_format_dict)))
     # constructor and validate
     function_declarations.extend(
-        [''] + cpp.constructor_declaration() + cpp.isvalid_declaration()
-        + cpp.object_json_declarations() + cpp.object_string_declarations()
-        + cpp.object_comparison_declaration())
-    function_definitions.extend(
+        [''] + cpp.constructor_declaration(members)
+        + _with_family(families, 'validate', cpp.isvalid_declaration())
+        + cpp.object_json_declarations(families)
+        + cpp.object_string_declarations(options.get('instrument', False),
+                                         families)
+        + _with_family(families, 'compare',
+                       cpp.object_comparison_declaration())
+        + _with_family(families, 'hash', cpp.object_hash_declaration()))
+    object_definitions = (
         cpp.object_init_definition(member_init)
-        + cpp.object_validate_definition(member_validate, members)
-        + cpp.object_conversion_definition(members) 
-        + cpp.object_comparison_definition(members))
+        + cpp.object_validate_definition(member_validate, members, families)
+        + cpp.object_conversion_definition(members, families)
+        + _with_family(families, 'compare',
+                       cpp.object_comparison_definition(members)
+                       + cpp.object_diff_definition(members))
+        + _with_family(families, 'hash', cpp.object_hash_definition(members)))
+    if options.get('instrument'):
+        object_definitions = cpp.instrument_definitions(object_definitions)
+    function_definitions.extend(object_definitions)
     # finalize and return
     code_parts['declarations'].extend(cpp.indent(member_defines))
     code_parts['declarations'].append('')
@@ -138,23 +305,42 @@ def generate_object(members):
     code_parts['declarations'].extend(cpp.indent(member_declarations))
     code_parts['declarations'].append('{rb}; // {typename}')
     code_parts['definitions'].extend(function_definitions)
+    code_parts['paths'] = paths
+    code_parts['api'] = families
     return code_parts
 
-def generate_reference(schema):
+def generate_reference(schema, options=None):
+    """Refer to a type of this schema or of a library.
+
+    typename is the name used in function names, cpp_type is the
+    qualified c++ type. Library types are qualified by the library
+    namespace, without leading :: since "<::" is a digraph in c++98.
+
+    """
+    options = options if options is not None else {}
     code_parts = {'predefine': [],
                   'declarations': [],
                   'definitions': []}
+    library_name, type_path = cl.split_reference(schema['$ref'])
     namespace_list = [cu.to_camel_case(name) 
-                      for name in  schema['$ref'].split('.')]
-    code_parts['typename'] = '::'.join(namespace_list)
+                      for name in type_path.split('.')]
+    if library_name is not None:
+        library = cl.find_library(options.get('libraries'), library_name)
+        namespace_list = library['namespace'] + namespace_list
+    code_parts['typename'] = namespace_list[-1]
+    code_parts['cpp_type'] = '::'.join(namespace_list)
     if len(namespace_list) > 1:
         namespace = '::'.join(namespace_list[:-1]) + '::'
     else:
         namespace = ''
     code_parts['namespace'] = namespace
+    if library_name is None:
+        code_parts['reference'] = type_path
     return code_parts
 
-def generate_array(element, schema):
+def generate_array(element, schema, options=None):
+    options = options if options is not None else {}
+    families = _api_families(options)
     length = schema.get('maxItems', None)
     code_parts = {'declarations': [], 'definitions': []}
     # predefines
@@ -162,8 +348,9 @@ def generate_array(element, schema):
     element_ns = element.get('namespace', '')
     code_parts['predefine'] = cu.rewrite(element['predefine'],
                                          {'typename': element_typename})
-    code_parts['predefine'].append('typedef std::vector<' + element_typename
-                                   + '> {typename};')
+    code_parts['predefine'].append(
+        'typedef std::vector<' + element.get('cpp_type', element_typename)
+        + '> {typename};')
     # copy declarations and add array declarations
     element_format_dict = {'typename': element_typename,
                            'name_array': '{name_array}',
@@ -172,37 +359,166 @@ def generate_array(element, schema):
                            'lb': '{lb}', 'rb': '{rb}'}
     code_parts['declarations'].extend(cu.rewrite(element['declarations'],
                                                  element_format_dict))
-    code_parts['declarations'].extend([''] + cpp.init_declaration() 
-                                      + cpp.validate_declaration()
-                                      + cpp.conversion_declaration())
+    code_parts['declarations'].extend([''] + cpp.init_declaration()
+                                      + cpp.array_prototype_declaration()
+                                      + cpp.validate_declaration(families)
+                                      + cpp.conversion_declaration(families)
+                                      + _with_family(families, 'hash',
+                                                     cpp.hash_declaration()))
     # definitions
     code_parts['definitions'].extend(cu.rewrite(element['definitions'],
                                                 element_format_dict))
+    array_definitions = (
+        cpp.array_init_definition(element_typename, length, element_ns,
+                                  schema.get('default'))
+        + _array_validate_and_conversion(element_typename, schema, element_ns,
+                                         families)
+        + _with_family(families, 'hash',
+                       cpp.array_hash_definition(element_typename,
+                                                 element_ns)))
+    if options.get('instrument'):
+        array_definitions = cpp.instrument_definitions(array_definitions)
+    code_parts['definitions'].extend(array_definitions)
+    return code_parts
+
+def _array_validate_and_conversion(element_typename, schema, element_ns,
+                                   families):
+    """Numeric elements are checked and converted inline in bulk."""
+    if cpp.is_numeric_array(schema):
+        return (cpp.numeric_array_validate_definition(schema, families)
+                + cpp.numeric_array_conversion_definition(schema, families))
+    return (cpp.array_validate_definition(element_typename, schema,
+                                          element_ns, families)
+            + cpp.array_conversion_definition(element_typename, schema,
+                                              element_ns, families))
+
+def generate_lazy(value, schema, options=None):
+    """Wrap code of a member into Lazy, converted on first access."""
+    options = options if options is not None else {}
+    families = _api_families(options)
+    code_parts = {'kind': 'lazy', 'declarations': [], 'definitions': []}
+    value_typename = value.get('typename', '{typename}Value')
+    value_ns = value.get('namespace', '')
+    value_format_dict = {'typename': value_typename,
+                         'name_array': '{name_array}',
+                         'namespace': '{namespace}',
+                         'function_prefix': '{function_prefix}',
+                         'lb': '{lb}', 'rb': '{rb}'}
+    code_parts['predefine'] = (cu.rewrite(value['predefine'],
+                                          {'typename': value_typename})
+                               + cpp.lazy_predefine())
+    code_parts['declarations'].extend(
+        cu.rewrite(value['declarations'], value_format_dict)
+        + cpp.lazy_traits_declaration(value.get('cpp_type', value_typename))
+        + [''] + cpp.init_declaration() + cpp.validate_declaration(families)
+        + cpp.conversion_declaration(families)
+        + _with_family(families, 'hash', cpp.hash_declaration()))
+    lazy_definitions = cpp.lazy_definition(value_typename, value_ns, families,
+                                           schema)
+    if options.get('instrument'):
+        lazy_definitions = cpp.instrument_definitions(lazy_definitions)
     code_parts['definitions'].extend(
-        cpp.array_init_definition(element_typename, length, element_ns)
-        + cpp.array_validate_definition(element_typename, schema, element_ns)
-        + cpp.array_conversion_definition(element_typename, schema, element_ns))
+        cu.rewrite(value['definitions'], value_format_dict)
+        + lazy_definitions)
     return code_parts
 
-_INCLUDES = ['stdint.h', 'string.h', 'stdlib.h', 'string', 'vector', 'cJSON.h']
+_INCLUDES = ['ctype.h', 'stdint.h', 'string.h', 'stdlib.h', 'string', 'vector', 'cJSON.h']
+
+def _split_definitions(definitions):
+    """Split formatted definitions into top level definitions.
+
+    Parts indent everything inside a definition, so a definition starts
+    at an unindented line and, if that line opens a block, ends at the
+    next unindented line, the closing brace.
+
+    """
+    units = []
+    in_block = False
+    for line in definitions:
+        if in_block:
+            units[-1].append(line)
+            in_block = not line.startswith('}')
+        else:
+            units.append([line])
+            in_block = line.endswith('{')
+    return units
+
+def _is_function(unit):
+    """Check if top level definition is a function, not a table."""
+    return len(unit) > 1 and '(' in unit[0] and not unit[0].endswith('= {')
+
+def type_code_size(name, code, name_code_dict=None):
+    """Return emitted lines, bytes and functions of a top level type.
+
+    Dotted path accessors are counted to the object they belong to.
+
+    """
+    format_dict = {}
+    format_dict.update(_FILE_FORMAT_DICT)
+    format_dict['typename'] = cu.to_camel_case(name)
+    format_dict['name'] = name
+    format_dict['name_array'] = '"' + name + '"'
+    declarations = cu.rewrite(code['predefine'] + code.get('declarations', []),
+                              format_dict)
+    definitions = cu.rewrite(code.get('definitions', []), format_dict)
+    if _has_paths(code):
+        declarations.extend(cu.rewrite(cpp.path_table_declaration(),
+                                       format_dict))
+        definitions.extend(_path_table_definition(name, code, name_code_dict,
+                                                 format_dict))
+    lines = declarations + definitions
+    return {'lines': len(lines),
+            'bytes': sum(len(line) + 1 for line in lines),
+            'functions': len([unit for unit in _split_definitions(definitions)
+                              if _is_function(unit)])}
+
+def _check_library_namespaces(namespace, options):
+    """Every unit defines helpers in its namespace, they must differ."""
+    namespaces = {'::'.join(namespace): 'the generated code'}
+    for library in (options or {}).get('libraries', []):
+        library_namespace = '::'.join(library['namespace'])
+        if library_namespace in namespaces:
+            raise ValueError(
+                'library "{0}" and {1} use the same namespace "{2}", their '
+                'helper definitions would clash, generate them into '
+                'different namespaces'.format(
+                    library['name'], namespaces[library_namespace],
+                    library_namespace))
+        namespaces[library_namespace] = 'library "{0}"'.format(
+            library['name'])
 
 def generate_files(name_code_dict, filename=None, namespace=None,
-                   include_path=None, includes=None):
+                   include_path=None, includes=None, timestamp=None,
+                   options=None, profile=None):
     namespace = namespace if namespace is not None else []
     filename = filename if filename is not None else 'config'
     include_path = include_path if include_path is not None else ''
     src_includes = includes if includes is not None else []
+    if options and options.get('instrument'):
+        src_includes = src_includes + ['time.h']
     assert isinstance(namespace, list) == True, 'Namespace must be a list.'
+    _check_library_namespaces(namespace, options)
     header_includes = _INCLUDES
     files = {}
-    files['header'] = '\n'.join(generate_header(
-        name_code_dict, namespace, header_includes, filename))
-    files['source'] = '\n'.join(generate_source(
-        name_code_dict, namespace, src_includes, filename, include_path))
+    with cp.phase(profile, 'generate_header'):
+        files['header'] = '\n'.join(generate_header(
+            name_code_dict, namespace, header_includes, filename, timestamp,
+            options))
+    with cp.phase(profile, 'generate_source'):
+        files['source'] = '\n'.join(generate_source(
+            name_code_dict, namespace, src_includes, filename, include_path,
+            options))
+    if profile is not None:
+        for name, code in name_code_dict.items():
+            profile.add_type(name, **type_code_size(name, code,
+                                                    name_code_dict))
     return files
 
+def output_files(code, filename):
+    """Return dict output file name -> content."""
+    return {filename + '.h': code['header'], filename + '.cc': code['source']}
+
 def write_files(code, filename):
-    with open(filename + '.h', 'w') as header:
-        header.write(code['header'])
-    with open(filename + '.cc', 'w') as src:
-            src.write(code['source'])
+    for output_filename, content in output_files(code, filename).items():
+        with open(output_filename, 'w') as output:
+            output.write(content)
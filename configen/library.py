@@ -0,0 +1,69 @@
+"""Shared type libraries referenced from other schemas.
+
+A library is a schema generated once into its own namespace and files.
+Its manifest is a json file:
+
+    {"name": "common", "namespace": "common", "header": "common/types.h",
+     "schema": "common.json"}
+
+Other schemas reference its top level types as "$ref": "common#endpoint",
+the schema path is relative to the manifest.
+
+"""
+
+import json
+import os.path
+
+_SEPARATOR = '#'
+
+
+def split_reference(reference):
+    """Return (library name or None, type path) of a $ref value."""
+    if _SEPARATOR in reference:
+        name, type_path = reference.split(_SEPARATOR, 1)
+        return name, type_path
+    return None, reference
+
+
+def _load_json(filename):
+    with open(filename, 'r') as json_file:
+        return json.load(json_file)
+
+
+def load_library(manifest_filename, load=None):
+    """Load manifest and library schema, namespace is returned as list.
+
+    load(filename) returns parsed json, callers may pass a memoized one.
+
+    """
+    load = load if load is not None else _load_json
+    manifest = load(manifest_filename)
+    schema_filename = os.path.join(os.path.dirname(manifest_filename),
+                                   manifest['schema'])
+    return {'name': manifest['name'],
+            'namespace': manifest['namespace'].split('.'),
+            'header': manifest['header'],
+            'schema': load(schema_filename)}
+
+
+def write_manifest(manifest_filename, name, namespace, header,
+                   schema_filename):
+    """Write manifest of a library generated from schema_filename."""
+    schema = os.path.relpath(os.path.abspath(schema_filename),
+                             os.path.dirname(os.path.abspath(manifest_filename)))
+    with open(manifest_filename, 'w') as manifest_file:
+        json.dump({'name': name, 'namespace': '.'.join(namespace),
+                   'header': header, 'schema': schema},
+                  manifest_file, indent=2, sort_keys=True)
+
+
+def find_library(libraries, name):
+    for library in libraries or []:
+        if library['name'] == name:
+            return library
+    raise ValueError('unknown library "{0}"'.format(name))
+
+
+def qualified_name(library_name, type_name):
+    """Return $ref value of a library type."""
+    return library_name + _SEPARATOR + type_name
@@ -1,5 +1,6 @@
 """Functions for generation parts of code."""
 
+import json
 import os.path
 from pprint import pprint
 import configen.utils as cu
@@ -276,6 +277,14 @@ def to_cpp_type(schema):
         return sign_prefix + 'int' + str(bit_length) + '_t'
     assert False, 'Type "' + str(typename) + '" is not a simple type'
 
+def integer_limits(schema):
+    """Return lowest and highest value of the c++ type of an integer."""
+    cpp_type = to_cpp_type(schema)
+    bit_length = int(cpp_type.lstrip('u')[len('int'):-len('_t')])
+    if cpp_type.startswith('u'):
+        return 0, 2 ** bit_length - 1
+    return -2 ** (bit_length - 1), 2 ** (bit_length - 1) - 1
+
 # ==================== init ====================
 
 def init_declaration():
@@ -299,9 +308,19 @@ def variable_init_definition(schema):
 
 # ==================== validate ====================
 
-def validate_declaration():
-    return ['{function_prefix}bool Validate{typename}(const {typename} &value);',
-            '{function_prefix}bool Validate{typename}(const cJSON *node);']
+def _selected(families, family):
+    """Check if API family is generated, None families means all."""
+    return families is None or family in families
+
+def validate_declaration(families=None):
+    declaration = []
+    if _selected(families, 'validate'):
+        declaration.append(
+            '{function_prefix}bool Validate{typename}(const {typename} &value);')
+    if _selected(families, 'validate_json'):
+        declaration.append(
+            '{function_prefix}bool Validate{typename}(const cJSON *node);')
+    return declaration
 
 _CHECK_TEMPLATES = {'minimum': '(value >= {minimum});',
                     'maximum': '(value <= {maximum});'}
@@ -357,14 +376,26 @@ def _variable_validate_json(schema):
     definition.append('{rb}')
     return definition
 
-def variable_validate_definition(schema):
-    return _variable_validate_value(schema) + _variable_validate_json(schema)
+def variable_validate_definition(schema, families=None):
+    definition = []
+    if _selected(families, 'validate'):
+        definition.extend(_variable_validate_value(schema))
+    if _selected(families, 'validate_json'):
+        definition.extend(_variable_validate_json(schema))
+    return definition
 
 # ==================== conversion ====================
 
-def conversion_declaration():
-    return ['{function_prefix}bool {typename}ToJson(const {typename} &value, cJSON **node);',
-            '{function_prefix}bool JsonTo{typename}(const cJSON *node, {typename} *value);']
+def conversion_declaration(families=None):
+    declaration = []
+    if _selected(families, 'to_json'):
+        declaration.append('{function_prefix}bool {typename}ToJson(const {typename} &value, cJSON **node, bool sparse = false);')
+    if _selected(families, 'from_json'):
+        declaration.extend([
+            '// take: node is deleted after the call, lazy members move their json',
+            '// out of it instead of copying it.',
+            '{function_prefix}bool JsonTo{typename}(const cJSON *node, {typename} *value, bool take = false);'])
+    return declaration
 
 _TYPE_NODE_CREATE_DICT = {
     'bool': 'cJSON_CreateBool(value)', 
@@ -373,8 +404,9 @@ _TYPE_NODE_CREATE_DICT = {
     'string': 'cJSON_CreateString(value.c_str())'}
 
 def _value_json_conversion(schema):
+    # variables are always written, sparse is handled by parent objects
     definition = [('bool {namespace}{typename}ToJson('
-                   'const {namespace}{typename} &value, cJSON **node) {lb}')]
+                   'const {namespace}{typename} &value, cJSON **node, bool) {lb}')]
     body = ['cJSON *new_node = ' + _TYPE_NODE_CREATE_DICT[schema['type']] + ';',
             '*node = new_node;',
             'return true;']
@@ -384,7 +416,7 @@ def _value_json_conversion(schema):
 
 def _json_value_conversion(schema):
     definition = [('bool {namespace}JsonTo{typename}('
-                   'const cJSON *node, {namespace}{typename} *value) {lb}')]
+                   'const cJSON *node, {namespace}{typename} *value, bool) {lb}')]
     body = _json_type_check(schema)
     body.append('*value = ' + _TYPE_VALUE_FIELD_DICT[schema['type']] + ';')
     body.append('return true;')
@@ -392,16 +424,25 @@ def _json_value_conversion(schema):
     definition.append('{rb}')
     return definition
 
-def variable_conversion_definition(schema):
-    return _value_json_conversion(schema) + _json_value_conversion(schema)
+def variable_conversion_definition(schema, families=None):
+    definition = []
+    if _selected(families, 'to_json'):
+        definition.extend(_value_json_conversion(schema))
+    if _selected(families, 'from_json'):
+        definition.extend(_json_value_conversion(schema))
+    return definition
 
 # ==================== object ====================
 
-def constructor_declaration():
-    return ['{typename}() {lb}',
-            indent('Init{typename}(this);'),
-            indent('pre_update = NULL;'),
-            '{rb}']
+def constructor_declaration(children):
+    """Copy members from the prototype instead of initializing them."""
+    initializers = ['pre_update(NULL)']
+    initializers.extend('{0}(Prototype().{0})'.format(child_name)
+                        for child_name in children)
+    return ['{typename}() : ' + ', '.join(initializers) + ' {lb}{rb}',
+            '// Build default value, used only by Prototype.',
+            'explicit {typename}(const PrototypeTag &);',
+            'static const {typename} &Prototype();']
 
 def object_comparison_declaration():
     return ['bool operator==(const {typename} &other) const;',
@@ -414,13 +455,23 @@ def isvalid_declaration():
             indent('return Validate{typename}(*this);'),
             '{rb}']
 
-def object_json_declarations():
-    return ['static bool IsJsonValid(const cJSON *node) {lb}',
-            indent('return Validate{typename}(node);'),
-            '{rb}',
-            'cJSON *ToJson() const {lb}',
+def object_json_declarations(families=None):
+    declaration = []
+    if _selected(families, 'validate_json'):
+        declaration.extend(['static bool IsJsonValid(const cJSON *node) {lb}',
+                            indent('return Validate{typename}(node);'),
+                            '{rb}'])
+    if _selected(families, 'to_json'):
+        declaration.extend(_object_to_json_declaration())
+    if _selected(families, 'from_json'):
+        declaration.extend(_object_from_json_declaration())
+    return declaration
+
+def _object_to_json_declaration():
+    return ['// Sparse json omits members equal to the prototype.',
+            'cJSON *ToJson(bool sparse = false) const {lb}',
             indent('cJSON *child;'),
-            indent('{typename}ToJson(*this, &child);'),
+            indent('{typename}ToJson(*this, &child, sparse);'),
             indent('cJSON *parent;'),
             indent('for (int i = kNamesLength - 1; i != -1; --i) {lb}'),
             indent('parent = cJSON_CreateObject();', 2),
@@ -428,39 +479,65 @@ def object_json_declarations():
             indent('child = parent;', 2),
             indent('{rb}'),
             indent('return parent;'),
-            '{rb}',
-            'bool FromJson(const cJSON *node) {lb}',
+            '{rb}']
+
+def _object_from_json_declaration():
+    return ['// take as in JsonTo{typename}.',
+            'bool FromJson(const cJSON *node, bool take = false) {lb}',
             indent('if (pre_update != NULL) {lb}'),
             indent('{typename} new_value = *this;', 2),
             indent('if (!JsonTo{typename}(node, &new_value)) return false;', 2),
             indent('if (!(*pre_update)(*this, new_value)) return false;', 2),
             indent('{rb}'),
-            indent('return JsonTo{typename}(node, this);'),
+            indent('return JsonTo{typename}(node, this, take);'),
             '{rb}']
 
-def object_string_declarations():
-    return ['std::string ToString() const {lb}',
-            indent('return JsonToString(ToJson());'),
+def object_string_declarations(instrument=False, families=None):
+    if instrument:
+        to_string = [indent(_instrument_macro('ToString')),
+                     indent('std::string serialized = JsonToString(ToJson(sparse));'),
+                     indent('CONFIGEN_INSTRUMENT_BYTES(serialized.size());'),
+                     indent('return serialized;')]
+        from_string = [indent(_instrument_macro('FromString')),
+                       indent('CONFIGEN_INSTRUMENT_BYTES(serialized.size());')]
+    else:
+        to_string = [indent('return JsonToString(ToJson(sparse));')]
+        from_string = []
+    declaration = []
+    if _selected(families, 'to_json'):
+        declaration.extend(['std::string ToString(bool sparse = false) const {lb}']
+                           + to_string + ['{rb}',
+                           'bool SaveToFile(const std::string &path) const {lb}',
+                           indent('return WriteFileAtomically(path, ToString());'),
+                           '{rb}'])
+    if _selected(families, 'from_json'):
+        declaration.extend(_object_from_string_declarations(from_string))
+    return declaration
+
+def _object_from_string_declarations(from_string):
+    return (['// Load sparse strings only into instances equal to the prototype.',
+             'bool FromString(const std::string &serialized, bool validate = true) {lb}']
+            + from_string + [
+            indent('return FromDocument(StringToJson(serialized), validate);'),
             '{rb}',
-            'bool FromString(const std::string &serialized, bool validate = true) {lb}',
-            indent('cJSON *node = StringToJson(serialized);'),
-            indent('if (node == NULL) return false;'),
-            indent('cJSON *child = NULL;'),
-            indent('cJSON *parent = const_cast<cJSON *>(node);'),
-            indent('for (int i = 0; i != kNamesLength; ++i) {lb}'),
-            indent('child = cJSON_GetObjectItem(parent, kNames[i]);', 2),
-            indent('if (child == NULL) return false;', 2),
-            indent('parent = child;', 2),
-            indent('{rb}'),
-            indent('node = child;'),
-            indent('if (validate && !IsJsonValid(node)) {lb}'),
-            indent('cJSON_Delete(node);', 2),
-            indent('return false;', 2),
+            'bool FromBuffer(const char *data, std::size_t length, bool validate = true) {lb}',
+            indent('return FromDocument(BufferToJson(data, length), validate);'),
+            '{rb}',
+            'bool LoadFromFile(const std::string &path, bool validate = true) {lb}',
+            indent('return FromDocument(FileToJson(path), validate);'),
+            '{rb}',
+            '// Update from parsed document and delete it.',
+            'bool FromDocument(cJSON *document, bool validate) {lb}',
+            indent('if (document == NULL) return false;'),
+            indent('cJSON *node = document;'),
+            indent('for (std::size_t i = 0; i != kNamesLength && node != NULL; ++i) {lb}'),
+            indent('node = cJSON_GetObjectItem(node, kNames[i]);', 2),
             indent('{rb}'),
-            indent('bool rc = FromJson(node);'),
-            indent('cJSON_Delete(node);'),
+            indent('bool rc = node != NULL && (!validate || IsJsonValid(node))'),
+            indent('&& FromJson(node, true);', 3),
+            indent('cJSON_Delete(document);'),
             indent('return rc;'),
-            '{rb}']
+            '{rb}'])
 
 def init_call(variable_code):
     return ['{namespace}Init{typename}(&value->{{name}});'.format(
@@ -473,14 +550,29 @@ def validate_call(variable_code):
         typename = variable_code.get('typename', '{typename}'))]
 
 def object_init_definition(member_calls):
+    """Create prototype and init function.
+
+    The prototype constructor and init call init functions of members,
+    they copy prototypes of member types. Init does not copy the whole
+    prototype, pre_update of the object and of nested objects is kept.
+
+    """
     definition = [
         'const char * const {namespace}{typename}::kNames[] = {lb}{name_array}{rb};',
         'const std::size_t {namespace}{typename}::kNamesLength = sizeof({namespace}{typename}::kNames)/sizeof({namespace}{typename}::kNames[0]);',
-        'void {namespace}Init{typename}({namespace}{typename} *value) {lb}']
-    body = []
+        '{namespace}{typename}::{typename}(const PrototypeTag &) : pre_update(NULL) {lb}']
+    body = ['{namespace}{typename} *value = this;']
     for member_call in member_calls:
         body.append(member_call)
     definition.extend(indent(body))
+    definition.extend([
+        '{rb}',
+        'const {namespace}{typename} &{namespace}{typename}::Prototype() {lb}',
+        indent('static const {namespace}{typename} prototype((PrototypeTag()));'),
+        indent('return prototype;'),
+        '{rb}',
+        'void {namespace}Init{typename}({namespace}{typename} *value) {lb}'])
+    definition.extend(indent(member_calls))
     definition.append('{rb}')
     return definition
 
@@ -520,38 +612,107 @@ def _object_validate_json(children):
     definition.append('{rb}')
     return definition
 
-def object_validate_definition(member_calls, children):
-    return _object_validate_value(member_calls) \
-        + _object_validate_json(children)
+def object_validate_definition(member_calls, children, families=None):
+    definition = []
+    if _selected(families, 'validate'):
+        definition.extend(_object_validate_value(member_calls))
+    if _selected(families, 'validate_json'):
+        definition.extend(_object_validate_json(children))
+    return definition
 
 def object_comparison_definition(children):
     definition = ['bool {namespace}{typename}::operator==(const {namespace}{typename} &other) const {lb}']
-    body = ['bool result = true;']
+    body = []
     for child_name in children:
-        body.append('result &= ({name} == other.{name});'.format(
+        body.append('if (!({name} == other.{name})) return false;'.format(
             name=child_name))
-    body.append('return result;')
+    body.append('return true;')
     definition.extend(indent(body))
     definition.append('{rb}')
     return definition;
 
+# ==================== diff ====================
+
+_DIFF_MASK_BITS = 64
+
+def has_diff(children):
+    """Check if every member gets a bit of the Diff mask.
+
+    Objects with more members get operator== but no Diff.
+
+    """
+    return len(children) <= _DIFF_MASK_BITS
+
+def diff_declaration(children):
+    if not has_diff(children):
+        return []
+    return ['{function_prefix}uint64_t Diff{typename}(const {typename} &a, const {typename} &b);']
+
+def _diff_bit_name(child_name):
+    return 'kDiff' + cu.to_camel_case(child_name)
+
+def object_diff_bits_declaration(children):
+    """Declare a mask bit for every member, bits follow schema order."""
+    if not has_diff(children):
+        return []
+    return ['static const uint64_t {0} = static_cast<uint64_t>(1) << {1};'.format(
+        _diff_bit_name(child_name), index)
+            for index, child_name in enumerate(children)]
+
+def object_diff_definition(children):
+    """Create function that returns mask of members that differ.
+
+    Each member is compared with operator== so comparison of a
+    subtree stops at the first difference, use Diff of the member type
+    to find out what changed inside it.
+
+    """
+    if not has_diff(children):
+        return []
+    definition = ['const uint64_t {namespace}{typename}::' + _diff_bit_name(c) + ';'
+                  for c in children]
+    definition.append(
+        'uint64_t {namespace}Diff{typename}(const {namespace}{typename} &a, '
+        'const {namespace}{typename} &b) {lb}')
+    body = ['uint64_t changed = 0;']
+    for child_name in children:
+        body.append(
+            'if (!(a.{name} == b.{name})) changed |= '
+            '{{namespace}}{{typename}}::{bit};'.format(
+                name=child_name, bit=_diff_bit_name(child_name)))
+    body.append('return changed;')
+    definition.extend(indent(body))
+    definition.append('{rb}')
+    return definition
+
 def _object_json_conversion(children):
     definition = [('bool {namespace}{typename}ToJson('
-                   'const {namespace}{typename} &value, cJSON **node) {lb}')]
+                   'const {namespace}{typename} &value, cJSON **node, '
+                   'bool sparse) {lb}')]
     body = ['cJSON *new_node = cJSON_CreateObject();',
             'if (new_node == NULL) return false;',
+            'const {namespace}{typename} &prototype = '
+            '{namespace}{typename}::Prototype();',
             'bool rc;',
             'cJSON *child;']
     for child_name, child_code in children.items():
         child_type = child_code.get('typename', cu.to_camel_case(child_name))
         child_namespace = child_code.get('namespace', '{typename}::')
+        # lazy members are not converted to find out if they are needed
+        same = ('value.{0}.IsKnownEqual(prototype.{0})'
+                if child_code.get('kind') == 'lazy'
+                else 'value.{0} == prototype.{0}').format(child_name)
         body.extend([
-            'child = NULL;',
-            'rc = {namespace}{typename}ToJson(value.{name}, &child);'.format(
-                name=child_name, namespace=child_namespace,
-                typename=child_type),
-            'if (!rc || child == NULL) return false;',
-            'cJSON_AddItemToObject(new_node, "{0}", child);'.format(child_name)])
+            'if (!sparse || !(' + same + ')) {lb}',
+            indent('child = NULL;'),
+            indent('rc = {namespace}{typename}ToJson(value.{name}, &child, '
+                   'sparse);').format(name=child_name,
+                                      namespace=child_namespace,
+                                      typename=child_type),
+            indent('if (!rc || child == NULL) return false;'),
+            indent('cJSON_AddItemToObject(new_node, "{0}", child);'.format(
+                child_name)),
+            '{rb}'])
     body.extend(['*node = new_node;', 'return true;'])
     definition.extend(indent(body))
     definition.append('{rb}')
@@ -559,7 +720,7 @@ def _object_json_conversion(children):
 
 def _json_object_conversion(children):
     definition = [('bool {namespace}JsonTo{typename}('
-                   'const cJSON *node, {namespace}{typename} *value) {lb}')]
+                   'const cJSON *node, {namespace}{typename} *value, bool take) {lb}')]
     body = _json_type_check({'type': 'object'})
     body.append(
         'for (cJSON *child = node->child; child; child = child->next) {lb}')
@@ -570,7 +731,7 @@ def _json_object_conversion(children):
         conversions.append(
             'if (strcmp(child->string, "{0}") == 0) {{lb}}'.format(child_name))
         conversions.append(indent(
-            '{namespace}JsonTo{typename}(child, &(value->{name}));'.format(
+            '{namespace}JsonTo{typename}(child, &(value->{name}), take);'.format(
                 name=child_name, typename=child_type,
                 namespace=child_namespace)))
         conversions.append(indent('continue;'))
@@ -582,22 +743,73 @@ def _json_object_conversion(children):
     definition.append('{rb}')
     return definition
 
-def object_conversion_definition(members):
-    return _object_json_conversion(members) + _json_object_conversion(members)
+def object_conversion_definition(members, families=None):
+    definition = []
+    if _selected(families, 'to_json'):
+        definition.extend(_object_json_conversion(members))
+    if _selected(families, 'from_json'):
+        definition.extend(_json_object_conversion(members))
+    return definition
+
+def array_prototype_declaration():
+    return ['{function_prefix}const {typename} &{typename}Prototype();']
+
+def _to_string_literal(text):
+    """Convert text to c++ string literal, escaped for format templates."""
+    literal = ['"']
+    for byte in text.encode('utf-8'):
+        char = chr(byte)
+        if char in '"\\':
+            literal.append('\\' + char)
+        elif char == '{':
+            literal.append('{lb}')
+        elif char == '}':
+            literal.append('{rb}')
+        elif 32 <= byte < 127:
+            literal.append(char)
+        else:
+            literal.append('\\{0:03o}'.format(byte))
+    literal.append('"')
+    return ''.join(literal)
 
-def array_init_definition(typename, length=None, element_ns=None):
+def array_init_definition(typename, length=None, element_ns=None,
+                          default=None):
+    """Create prototype and init function that copies it.
+
+    The prototype is built once, from the default list if it is given
+    in the schema otherwise it contains length default elements.
+
+    """
     element_ns = element_ns if element_ns is not None else ''
     definition = [
-        'void {namespace}Init{typename}({namespace}{typename} *value) {lb}']
-    if length is not None:
-        body = []
-        body.extend(['value->resize({0});'.format(length),
-                     ('for (int i = 0; i != {length}; ++i) '
-                      '{namespace}Init{typename}(&(*value)[i]);').format(
-                          length=length, typename=typename,
-                          namespace=element_ns)])
-        definition.extend(indent(body))
-    definition.append('{rb}')
+        'const {namespace}{typename} &{namespace}{typename}Prototype() {lb}',
+        indent('struct Builder {lb}'),
+        indent('static {namespace}{typename} Build() {lb}', 2),
+        indent('{namespace}{typename} value;', 3)]
+    if default is not None:
+        definition.extend(indent([
+            'cJSON *node = cJSON_Parse({0});'.format(
+                _to_string_literal(json.dumps(default))),
+            'if (node != NULL) {lb}',
+            indent('{namespace}JsonTo{typename}(node, &value);'),
+            indent('cJSON_Delete(node);'),
+            '{rb}'], 3))
+    elif length is not None:
+        definition.extend(indent([
+            'value.resize({0});'.format(length),
+            ('for (int i = 0; i != {length}; ++i) '
+             '{namespace}Init{typename}(&value[i]);').format(
+                 length=length, typename=typename, namespace=element_ns)], 3))
+    definition.extend([
+        indent('return value;', 3),
+        indent('{rb}', 2),
+        indent('{rb};'),
+        indent('static const {namespace}{typename} prototype = Builder::Build();'),
+        indent('return prototype;'),
+        '{rb}',
+        'void {namespace}Init{typename}({namespace}{typename} *value) {lb}',
+        indent('*value = {namespace}{typename}Prototype();'),
+        '{rb}'])
     return definition
 
 def _array_validate_value(typename, element_ns):
@@ -637,19 +849,25 @@ def _array_validate_json(typename, schema, element_ns):
     definition.append('{rb}')
     return definition
 
-def array_validate_definition(typename, schema, element_ns=None):
+def array_validate_definition(typename, schema, element_ns=None,
+                              families=None):
     element_ns = element_ns if element_ns is not None else ''
-    return _array_validate_value(typename, element_ns) \
-        + _array_validate_json(typename, schema, element_ns)
+    definition = []
+    if _selected(families, 'validate'):
+        definition.extend(_array_validate_value(typename, element_ns))
+    if _selected(families, 'validate_json'):
+        definition.extend(_array_validate_json(typename, schema, element_ns))
+    return definition
 
 def _array_json_conversion(element_typename, schema, element_ns):
     definition = [('bool {namespace}{typename}ToJson('
-                   'const {namespace}{typename} &value, cJSON **node) {lb}')]
+                   'const {namespace}{typename} &value, cJSON **node, '
+                   'bool sparse) {lb}')]
     body = ['cJSON *new_node = cJSON_CreateArray();',
             'if (new_node == NULL) return false;',
             'for (unsigned i = 0; i != value.size(); ++i) {lb}',
             indent('cJSON *item;'),
-            indent('if (!{namespace}{typename}ToJson(value[i], &item)) '
+            indent('if (!{namespace}{typename}ToJson(value[i], &item, sparse)) '
                    'return false;').format(namespace=element_ns,
                                            typename=element_typename),
             indent('cJSON_AddItemToArray(new_node, item);'),
@@ -660,14 +878,23 @@ def _array_json_conversion(element_typename, schema, element_ns):
     return definition
 
 def _json_array_conversion(element_typename, schema, element_ns):
+    """Create conversion that replaces every element.
+
+    Elements are reset to the prototype of their type before conversion,
+    sparse elements are written relative to it and must not take members
+    of the array default or of the previous value.
+
+    """
     definition = [('bool {namespace}JsonTo{typename}('
-                   'const cJSON *node, {namespace}{typename} *value) {lb}')]
+                   'const cJSON *node, {namespace}{typename} *value, bool take) {lb}')]
     body = _json_type_check(schema)
     body.extend([
         'value->resize(cJSON_GetArraySize(const_cast<cJSON *>(node)));',
         'cJSON *child = node->child;',
         'for (unsigned i = 0; i != value->size(); ++i) {lb}',
-        indent('{namespace}JsonTo{typename}(child, &(*value)[i]);'.format(
+        indent('{namespace}Init{typename}(&(*value)[i]);'.format(
+            typename=element_typename, namespace=element_ns)),
+        indent('{namespace}JsonTo{typename}(child, &(*value)[i], take);'.format(
             typename=element_typename, namespace=element_ns)),
         indent('child = child->next;'),
         '{rb}'])
@@ -676,10 +903,1004 @@ def _json_array_conversion(element_typename, schema, element_ns):
     definition.append('{rb}')
     return definition
 
-def array_conversion_definition(element_typename, schema, element_ns=None):
+def array_conversion_definition(element_typename, schema, element_ns=None,
+                                families=None):
     element_ns = element_ns if element_ns is not None else ''
-    return _array_json_conversion(element_typename, schema, element_ns) \
-        + _json_array_conversion(element_typename, schema, element_ns)
+    definition = []
+    if _selected(families, 'to_json'):
+        definition.extend(
+            _array_json_conversion(element_typename, schema, element_ns))
+    if _selected(families, 'from_json'):
+        definition.extend(
+            _json_array_conversion(element_typename, schema, element_ns))
+    return definition
+
+# ==================== numeric arrays ====================
+
+_NUMERIC_TYPES = ('integer', 'number')
+
+def is_numeric_array(schema):
+    """Check if array elements are integers or numbers stored inline."""
+    return (schema.get('type') == 'array'
+            and schema['items'].get('type') in _NUMERIC_TYPES)
+
+def _numeric_range_checks(items, item):
+    """Return comparisons an element passes, they reject NaN like Validate."""
+    checks = []
+    if 'minimum' in items:
+        checks.append('{0} >= {1}'.format(item, items['minimum']))
+    if 'maximum' in items:
+        checks.append('{0} <= {1}'.format(item, items['maximum']))
+    return checks
+
+def _numeric_array_validate_value(schema):
+    definition = [
+        'bool {namespace}Validate{typename}(const {namespace}{typename} &value) {lb}']
+    checks = _numeric_range_checks(schema['items'], 'data[i]')
+    if not checks:
+        definition.extend(indent(['return true;']))
+        definition.append('{rb}')
+        return definition
+    # branch free count of failures so the loop is vectorized, numbers are
+    # counted in double to keep all lanes the same width
+    if schema['items']['type'] == 'number':
+        counter = 'double'
+        failure = '(' + ' && '.join(checks) + ') ? 0.0 : 1.0'
+    else:
+        counter = 'std::size_t'
+        failure = ' | '.join('!({0})'.format(check) for check in checks)
+    body = ['const std::size_t size = value.size();',
+            'if (size == 0) return true;',
+            'const {namespace}{typename}::value_type *data = &value[0];',
+            counter + ' invalid = 0;',
+            'for (std::size_t i = 0; i != size; ++i) {lb}',
+            indent('invalid += ' + failure + ';'),
+            '{rb}',
+            'return invalid == 0;']
+    definition.extend(indent(body))
+    definition.append('{rb}')
+    return definition
+
+def _numeric_array_validate_json(schema):
+    definition = [
+        'bool {namespace}Validate{typename}(const cJSON *node) {lb}']
+    body = _json_type_check(schema)
+    if 'minItems' in schema or 'maxItems' in schema:
+        body.append('unsigned array_length = cJSON_GetArraySize(const_cast<cJSON *>(node));')
+    if 'minItems' in schema:
+        body.append('if (array_length < ' + str(schema['minItems']) + ') return false;')
+    if 'maxItems' in schema:
+        body.append('if (array_length > ' + str(schema['maxItems']) + ') return false;')
+    body.append('for (cJSON *child = node->child; child; child = child->next) {lb}')
+    body.append(indent('if (child->type != cJSON_Number) return false;'))
+    checks = _numeric_range_checks(schema['items'], 'item')
+    if checks:
+        body.extend(indent([
+            '{namespace}{typename}::value_type item = '
+            + _TYPE_VALUE_FIELD_DICT[schema['items']['type']].replace(
+                'node->', 'child->') + ';',
+            'if (!(' + ' && '.join(checks) + ')) return false;']))
+    body.extend(['{rb}', 'return true;'])
+    definition.extend(indent(body))
+    definition.append('{rb}')
+    return definition
+
+def numeric_array_validate_definition(schema, families=None):
+    """Validate elements inline instead of calling element functions."""
+    definition = []
+    if _selected(families, 'validate'):
+        definition.extend(_numeric_array_validate_value(schema))
+    if _selected(families, 'validate_json'):
+        definition.extend(_numeric_array_validate_json(schema))
+    return definition
+
+def _numeric_array_json_conversion(schema):
+    definition = [('bool {namespace}{typename}ToJson('
+                   'const {namespace}{typename} &value, cJSON **node, '
+                   'bool) {lb}')]
+    element_type = to_cpp_type(schema['items'])
+    body = ['cJSON *new_node;',
+            'if (value.empty()) {lb}',
+            indent('new_node = cJSON_CreateArray();'),
+            '{rb} else {lb}']
+    count = 'static_cast<int>(value.size())'
+    if element_type == 'double':
+        body.append(indent(
+            'new_node = cJSON_CreateDoubleArray(&value[0], ' + count + ');'))
+    elif element_type == 'int32_t':
+        body.append(indent(
+            'new_node = cJSON_CreateIntArray(&value[0], ' + count + ');'))
+    else:
+        # cJSON keeps numbers as double, as cJSON_CreateNumber does
+        body.extend(indent([
+            'std::vector<double> numbers(value.begin(), value.end());',
+            'new_node = cJSON_CreateDoubleArray(&numbers[0], ' + count + ');']))
+    body.extend(['{rb}',
+                 'if (new_node == NULL) return false;',
+                 '*node = new_node;',
+                 'return true;'])
+    definition.extend(indent(body))
+    definition.append('{rb}')
+    return definition
+
+def _json_numeric_array_conversion(schema):
+    definition = [('bool {namespace}JsonTo{typename}('
+                   'const cJSON *node, {namespace}{typename} *value, bool) {lb}')]
+    body = _json_type_check(schema)
+    # one pass over the list, storage of the previous value is reused
+    body.extend([
+        'std::size_t count = 0;',
+        'for (cJSON *child = node->child; child; child = child->next) {lb}',
+        indent('if (child->type != cJSON_Number) return false;'),
+        indent('if (count == value->size()) '
+               'value->push_back({namespace}{typename}::value_type());'),
+        indent('(*value)[count] = '
+               + _TYPE_VALUE_FIELD_DICT[schema['items']['type']].replace(
+                   'node->', 'child->') + ';'),
+        indent('++count;'),
+        '{rb}',
+        'value->resize(count);',
+        'return true;'])
+    definition.extend(indent(body))
+    definition.append('{rb}')
+    return definition
+
+def numeric_array_conversion_definition(schema, families=None):
+    """Convert elements in bulk instead of calling element functions."""
+    definition = []
+    if _selected(families, 'to_json'):
+        definition.extend(_numeric_array_json_conversion(schema))
+    if _selected(families, 'from_json'):
+        definition.extend(_json_numeric_array_conversion(schema))
+    return definition
+
+# ==================== lazy ====================
+
+def lazy_declaration():
+    """Generate template of members converted on first access."""
+    return (['// Move content of node into a new node, node is left empty.',
+             'cJSON *TakeJson(cJSON *node);',
+             '// Compare json trees, members in the same order.',
+             'bool JsonEqual(const cJSON *a, const cJSON *b);',
+             '// Member that keeps its json node, only the json type is checked when',
+             '// it is read, the node is validated and converted on first access.',
+             '// First access changes the member, so call Load() before an instance',
+             '// is shared between threads.',
+             'template <class Traits>',
+             'class Lazy {lb}',
+             ' public:']
+            + indent(['typedef typename Traits::Value Value;',
+                    'Lazy() : node_(NULL), value_(NULL), valid_(true) {lb}{rb}',
+                    'Lazy(const Lazy &other) : node_(NULL), value_(NULL), valid_(other.valid_) {lb}',
+                    indent('CopyFrom(other);'),
+                    '{rb}',
+                    'Lazy &operator=(const Lazy &other) {lb}',
+                    indent('if (this == &other) return *this;'),
+                    indent('Clear();'),
+                    indent('valid_ = other.valid_;'),
+                    indent('CopyFrom(other);'),
+                    indent('return *this;'),
+                    '{rb}',
+                    '~Lazy() {lb}',
+                    indent('Clear();'),
+                    '{rb}',
+                    '// Keep copy of node to convert it later.',
+                    'bool Assign(const cJSON *node) {lb}',
+                    indent('return Keep(cJSON_Duplicate(const_cast<cJSON *>(node), 1));'),
+                    '{rb}',
+                    '// Keep content of a node that is deleted afterwards, without copy.',
+                    'bool Take(cJSON *node) {lb}',
+                    indent('return Keep(TakeJson(node));'),
+                    '{rb}',
+                    '// Convert kept node, false if it is not valid, the value is the',
+                    '// prototype then.',
+                    'bool Load() const {lb}',
+                    indent('if (node_ == NULL) return valid_;'),
+                    indent('valid_ = Traits::ValidateJson(node_);'),
+                    indent('if (valid_) {lb}'),
+                    indent('value_ = new Value(Traits::Prototype());', 2),
+                    indent('valid_ = Traits::JsonTo(node_, value_, true);', 2),
+                    indent('{rb}'),
+                    indent('if (!valid_) {lb}'),
+                    indent('delete value_;', 2),
+                    indent('value_ = NULL;', 2),
+                    indent('{rb}'),
+                    indent('cJSON_Delete(node_);'),
+                    indent('node_ = NULL;'),
+                    indent('return valid_;'),
+                    '{rb}',
+                    'bool IsLoaded() const {lb}',
+                    indent('return node_ == NULL;'),
+                    '{rb}',
+                    'const Value &Get() const {lb}',
+                    indent('Load();'),
+                    indent('return value_ != NULL ? *value_ : Traits::Prototype();'),
+                    '{rb}',
+                    '// Value to change, replaces value of a node that is not valid.',
+                    'Value *Mutable() {lb}',
+                    indent('Load();'),
+                    indent('valid_ = true;'),
+                    indent('if (value_ == NULL) value_ = new Value(Traits::Prototype());'),
+                    indent('return value_;'),
+                    '{rb}',
+                    '// Kept node is copied without conversion.',
+                    'bool ToJson(cJSON **node, bool sparse) const {lb}',
+                    indent('if (node_ == NULL) return Traits::ToJson(Get(), node, sparse);'),
+                    indent('*node = cJSON_Duplicate(node_, 1);'),
+                    indent('return *node != NULL;'),
+                    '{rb}',
+                    '// Equal without conversion, false if that is not known: kept nodes',
+                    '// are compared as json, converted values as values.',
+                    'bool IsKnownEqual(const Lazy &other) const {lb}',
+                    indent('if (node_ != NULL && other.node_ != NULL) return JsonEqual(node_, other.node_);'),
+                    indent('return node_ == NULL && other.node_ == NULL && Get() == other.Get();'),
+                    '{rb}',
+                    'bool operator==(const Lazy &other) const {lb}',
+                    indent('return IsKnownEqual(other) || Get() == other.Get();'),
+                    '{rb}'])
+            + [' private:']
+            + indent(['bool Keep(cJSON *node) {lb}',
+                    indent('if (node == NULL) return false;'),
+                    indent('Clear();'),
+                    indent('node_ = node;'),
+                    indent('valid_ = true;'),
+                    indent('return true;'),
+                    '{rb}',
+                    'void Clear() {lb}',
+                    indent('cJSON_Delete(node_);'),
+                    indent('node_ = NULL;'),
+                    indent('delete value_;'),
+                    indent('value_ = NULL;'),
+                    '{rb}',
+                    'void CopyFrom(const Lazy &other) {lb}',
+                    indent('if (other.node_ != NULL) node_ = cJSON_Duplicate(other.node_, 1);'),
+                    indent('if (other.value_ != NULL) value_ = new Value(*other.value_);'),
+                    '{rb}',
+                    'mutable cJSON *node_;',
+                    '// NULL means the prototype',
+                    'mutable Value *value_;',
+                    'mutable bool valid_;'])
+            + ['{rb};'])
+
+def lazy_helpers_definition():
+    return ['cJSON *TakeJson(cJSON *node) {lb}',
+            indent('cJSON *taken = cJSON_CreateNull();'),
+            indent('if (taken == NULL) return NULL;'),
+            indent('taken->type = node->type;'),
+            indent('taken->child = node->child;'),
+            indent('taken->valuestring = node->valuestring;'),
+            indent('taken->valueint = node->valueint;'),
+            indent('taken->valuedouble = node->valuedouble;'),
+            indent('node->child = NULL;'),
+            indent('node->valuestring = NULL;'),
+            indent('return taken;'),
+            '{rb}',
+            'bool JsonEqual(const cJSON *a, const cJSON *b) {lb}',
+            indent('if (a->type != b->type) return false;'),
+            indent('if (a->type == cJSON_Number) return a->valuedouble == b->valuedouble;'),
+            indent('if (a->type == cJSON_String) return strcmp(a->valuestring, b->valuestring) == 0;'),
+            indent('const cJSON *a_child = a->child;'),
+            indent('const cJSON *b_child = b->child;'),
+            indent('for (; a_child != NULL && b_child != NULL; a_child = a_child->next, b_child = b_child->next) {lb}'),
+            indent('if (a->type == cJSON_Object && strcmp(a_child->string, b_child->string) != 0) return false;', 2),
+            indent('if (!JsonEqual(a_child, b_child)) return false;', 2),
+            indent('{rb}'),
+            indent('return a_child == NULL && b_child == NULL;'),
+            '{rb}']
+
+def lazy_predefine():
+    return ['struct {typename}Traits;',
+            'typedef Lazy<{typename}Traits> {typename};']
+
+def lazy_traits_declaration(value_typename):
+    """Generate traits with functions of value type used by Lazy."""
+    return (['struct {typename}Traits {lb}']
+            + indent(['typedef {0} Value;'.format(value_typename),
+                    'static bool Validate(const Value &value);',
+                    'static bool ValidateJson(const cJSON *node);',
+                    'static bool ToJson(const Value &value, cJSON **node, bool sparse);',
+                    'static bool JsonTo(const cJSON *node, Value *value, bool take);',
+                    'static uint64_t Hash(const Value &value, uint64_t hash);',
+                    'static const Value &Prototype();'])
+            + ['{rb};'])
+
+def lazy_definition(value_typename, value_ns=None, families=None,
+                    schema=None):
+    """Create functions of a lazy member, schema is the member schema."""
+    value_ns = value_ns if value_ns is not None else ''
+    schema = schema if schema is not None else {}
+    traits = '{namespace}{typename}Traits'
+    value_format_dict = {'value_ns': value_ns, 'value': value_typename,
+                         'traits': traits}
+    # family -> traits function forwarding to the value function
+    traits_functions = [
+        ('validate', [
+            'bool {traits}::Validate(const {traits}::Value &value) {{lb}}',
+            indent('return {value_ns}Validate{value}(value);'),
+            '{{rb}}']),
+        ('validate_json', [
+            'bool {traits}::ValidateJson(const cJSON *node) {{lb}}',
+            indent('return {value_ns}Validate{value}(node);'),
+            '{{rb}}']),
+        ('to_json', [
+            ('bool {traits}::ToJson(const {traits}::Value &value, cJSON **node, '
+             'bool sparse) {{lb}}'),
+            indent('return {value_ns}{value}ToJson(value, node, sparse);'),
+            '{{rb}}']),
+        ('from_json', [
+            ('bool {traits}::JsonTo(const cJSON *node, {traits}::Value *value, '
+             'bool take) {{lb}}'),
+            indent('return {value_ns}JsonTo{value}(node, value, take);'),
+            '{{rb}}']),
+        ('hash', [
+            ('uint64_t {traits}::Hash(const {traits}::Value &value, '
+             'uint64_t hash) {{lb}}'),
+            indent('return {value_ns}Hash{value}(value, hash);'),
+            '{{rb}}'])]
+    definition = []
+    for family, function in traits_functions:
+        if _selected(families, family):
+            definition.extend(function)
+    definition.extend([
+        'const {traits}::Value &{traits}::Prototype() {{lb}}',
+        indent('struct Builder {{lb}}'),
+        indent('static Value Build() {{lb}}', 2),
+        indent('Value value;', 3),
+        indent('{value_ns}Init{value}(&value);', 3),
+        indent('return value;', 3),
+        indent('{{rb}}', 2),
+        indent('{{rb}};'),
+        indent('static const Value prototype = Builder::Build();'),
+        indent('return prototype;'),
+        '{{rb}}'])
+    definition = [line.format(**value_format_dict) for line in definition]
+    definition.extend([
+        'void {namespace}Init{typename}({namespace}{typename} *value) {lb}',
+        indent('*value = {namespace}{typename}();'),
+        '{rb}'])
+    if _selected(families, 'validate'):
+        definition.extend([
+            'bool {namespace}Validate{typename}(const {namespace}{typename} &value) {lb}',
+            indent('return value.Load() && ' + traits + '::Validate(value.Get());'),
+            '{rb}'])
+    if _selected(families, 'validate_json'):
+        # content is validated by Load on first access
+        type_check = (_json_type_check(schema) if schema.get('type')
+                      in _TYPE_CHECK_DICT else [])
+        definition.extend(
+            ['bool {namespace}Validate{typename}(const cJSON *node) {lb}',
+             indent('if (node == NULL) return false;')]
+            + indent(type_check) + [indent('return true;'), '{rb}'])
+    if _selected(families, 'to_json'):
+        definition.extend([
+            ('bool {namespace}{typename}ToJson('
+             'const {namespace}{typename} &value, cJSON **node, bool sparse) {lb}'),
+            indent('return value.ToJson(node, sparse);'),
+            '{rb}'])
+    if _selected(families, 'from_json'):
+        definition.extend([
+            ('bool {namespace}JsonTo{typename}('
+             'const cJSON *node, {namespace}{typename} *value, bool take) {lb}'),
+            indent('if (take) return value->Take(const_cast<cJSON *>(node));'),
+            indent('return value->Assign(node);'),
+            '{rb}'])
+    if _selected(families, 'hash'):
+        definition.extend([
+            ('uint64_t {namespace}Hash{typename}('
+             'const {namespace}{typename} &value, uint64_t hash) {lb}'),
+            indent('return ' + traits + '::Hash(value.Get(), hash);'),
+            '{rb}'])
+    return definition
+
+# ==================== hash ====================
+
+def hash_declaration():
+    return ['{function_prefix}uint64_t Hash{typename}(const {typename} &value, uint64_t hash = kHashBasis);']
+
+_TYPE_HASH_DICT = {
+    'bool': 'configen_hash::HashUint64(value ? 1 : 0, hash)',
+    'integer': 'configen_hash::HashUint64(static_cast<uint64_t>(value), hash)',
+    'number': 'configen_hash::HashDouble(value, hash)',
+    'string': 'configen_hash::HashString(value, hash)'}
+
+def variable_hash_definition(schema):
+    return [('uint64_t {namespace}Hash{typename}('
+             'const {namespace}{typename} &value, uint64_t hash) {lb}'),
+            indent('return ' + _TYPE_HASH_DICT[schema['type']] + ';'),
+            '{rb}']
+
+def object_hash_declaration():
+    return ['uint64_t Hash() const {lb}',
+            indent('return Hash{typename}(*this);'),
+            '{rb}']
+
+def object_hash_definition(children):
+    definition = [('uint64_t {namespace}Hash{typename}('
+                   'const {namespace}{typename} &value, uint64_t hash) {lb}')]
+    body = []
+    for child_name, child_code in children.items():
+        child_type = child_code.get('typename', cu.to_camel_case(child_name))
+        child_namespace = child_code.get('namespace', '{typename}::')
+        body.append('hash = {namespace}Hash{typename}(value.{name}, hash);'.format(
+            name=child_name, namespace=child_namespace, typename=child_type))
+    body.append('return hash;')
+    definition.extend(indent(body))
+    definition.append('{rb}')
+    return definition
+
+def array_hash_definition(element_typename, element_ns=None):
+    element_ns = element_ns if element_ns is not None else ''
+    definition = [('uint64_t {namespace}Hash{typename}('
+                   'const {namespace}{typename} &value, uint64_t hash) {lb}')]
+    body = ['hash = configen_hash::HashUint64(value.size(), hash);',
+            'for (unsigned i = 0; i != value.size(); ++i) {lb}',
+            indent('hash = {namespace}Hash{typename}(value[i], hash);'.format(
+                namespace=element_ns, typename=element_typename)),
+            '{rb}',
+            'return hash;']
+    definition.extend(indent(body))
+    definition.append('{rb}')
+    return definition
+
+def hash_helpers_declaration():
+    """Generate FNV-1a 64 helpers used by generated hash functions.
+
+    Helpers are in their own namespace, Hash<Type> of types named string,
+    bytes, uint64 or double would clash with them otherwise.
+
+    """
+    return ['const uint64_t kHashBasis = '
+            '(static_cast<uint64_t>(0xcbf29ce4UL) << 32) | 0x84222325UL;',
+            'namespace configen_hash {lb}',
+            'uint64_t HashBytes(const void *data, std::size_t length, uint64_t hash);',
+            'uint64_t HashUint64(uint64_t value, uint64_t hash);',
+            'uint64_t HashDouble(double value, uint64_t hash);',
+            'uint64_t HashString(const std::string &value, uint64_t hash);',
+            '{rb}']
+
+def hash_helpers_definition():
+    return ['namespace configen_hash {lb}',
+            'uint64_t HashBytes(const void *data, std::size_t length, uint64_t hash) {lb}',
+            indent('const unsigned char *bytes = static_cast<const unsigned char *>(data);'),
+            indent('const uint64_t prime = (static_cast<uint64_t>(1) << 40) | 0x1b3;'),
+            indent('for (std::size_t i = 0; i != length; ++i) {lb}'),
+            indent('hash ^= bytes[i];', 2),
+            indent('hash *= prime;', 2),
+            indent('{rb}'),
+            indent('return hash;'),
+            '{rb}',
+            'uint64_t HashUint64(uint64_t value, uint64_t hash) {lb}',
+            indent('unsigned char bytes[8];'),
+            indent('for (int i = 0; i != 8; ++i) {lb}'),
+            indent('bytes[i] = static_cast<unsigned char>(value >> (8 * i));', 2),
+            indent('{rb}'),
+            indent('return HashBytes(bytes, sizeof(bytes), hash);'),
+            '{rb}',
+            'uint64_t HashDouble(double value, uint64_t hash) {lb}',
+            indent('if (value == 0) value = 0; // -0.0 == 0.0 so hash them alike'),
+            indent('uint64_t bits;'),
+            indent('memcpy(&bits, &value, sizeof(bits));'),
+            indent('return HashUint64(bits, hash);'),
+            '{rb}',
+            'uint64_t HashString(const std::string &value, uint64_t hash) {lb}',
+            indent('hash = HashUint64(value.size(), hash);'),
+            indent('return HashBytes(value.data(), value.size(), hash);'),
+            '{rb}',
+            '{rb} // namespace configen_hash']
+
+# ==================== paths ====================
+
+# schema type -> (FieldKind, FieldValue member)
+_FIELD_KINDS = {'bool': ('kFieldBool', 'boolean'),
+                'integer': ('kFieldInteger', 'integer'),
+                'number': ('kFieldNumber', 'number'),
+                'string': ('kFieldString', 'string')}
+
+# FieldValue factories: (name, argument type, FieldKind, member)
+_FIELD_FACTORIES = [('Bool', 'bool', 'kFieldBool', 'boolean'),
+                    ('Integer', 'int64_t', 'kFieldInteger', 'integer'),
+                    ('Number', 'double', 'kFieldNumber', 'number'),
+                    ('String', 'const std::string &', 'kFieldString', 'string')]
+
+def field_accessor_declaration():
+    return (['enum FieldKind {lb}',
+             indent('kFieldOther, // object, array or lazy member, only json access'),
+             indent('kFieldBool,'),
+             indent('kFieldInteger,'),
+             indent('kFieldNumber,'),
+             indent('kFieldString'),
+             '{rb};',
+             '// Value of a bool, integer, number or string member read or written by path.',
+             'struct FieldValue {lb}']
+            + indent(['FieldKind kind;',
+                      'bool boolean;',
+                      'int64_t integer;',
+                      'double number;',
+                      'std::string string;',
+                      'FieldValue() : kind(kFieldOther), boolean(false), integer(0), number(0) {lb}{rb}']
+                     + ['static FieldValue {0}({1} value);'.format(name, argument)
+                        for name, argument, _, _ in _FIELD_FACTORIES])
+            + ['{rb};',
+               '// Member of T found by its dotted path. get and set copy the value',
+               '// without json, they are NULL for members of kind kFieldOther.',
+               'template <class T>',
+               'struct FieldAccessor {lb}',
+               indent('const char *path;'),
+               indent('FieldKind kind;'),
+               indent('bool (*get)(const T &value, FieldValue *field);'),
+               indent('bool (*set)(T *value, const FieldValue &field, bool validate);'),
+               indent('bool (*to_json)(const T &value, cJSON **node);'),
+               indent('bool (*from_json)(const cJSON *node, T *value);'),
+               indent('bool (*validate)(const cJSON *node);'),
+               '{rb};',
+               '// Finalize hash so every bit depends on all bits, used by path tables.',
+               'uint64_t MixHash(uint64_t hash);'])
+
+def field_accessor_definition():
+    definition = []
+    for name, argument, kind, member in _FIELD_FACTORIES:
+        definition.extend([
+            'FieldValue FieldValue::{0}({1} value) {{lb}}'.format(name, argument),
+            indent('FieldValue field;'),
+            indent('field.kind = {0};'.format(kind)),
+            indent('field.{0} = value;'.format(member)),
+            indent('return field;'),
+            '{rb}'])
+    return definition + [
+        'uint64_t MixHash(uint64_t hash) {lb}',
+        indent('hash ^= hash >> 33;'),
+        indent('hash *= (static_cast<uint64_t>(0xff51afd7) << 32) | 0xed558ccd;'),
+        indent('hash ^= hash >> 33;'),
+        indent('hash *= (static_cast<uint64_t>(0xc4ceb9fe) << 32) | 0x1a85ec53;'),
+        indent('hash ^= hash >> 33;'),
+        indent('return hash;'),
+        '{rb}']
+
+def path_table_declaration():
+    return ['// Find member by dotted path that starts with the type name, NULL if',
+            '// the path is unknown.',
+            'const FieldAccessor<{typename}> *Find{typename}Field(const char *path, std::size_t length);',
+            'bool Get{typename}Field(const {typename} &value, const std::string &path, std::string *json);',
+            '// Convert json into the member, pre_update is called as in FromJson.',
+            'bool Set{typename}Field({typename} *value, const std::string &path, const std::string &json, bool validate = true);',
+            '// Typed access without json, false for unknown paths, members of kind',
+            '// kFieldOther and values of another kind or out of the member type.',
+            'bool Get{typename}Field(const {typename} &value, const std::string &path, FieldValue *field);',
+            'bool Set{typename}Field({typename} *value, const std::string &path, const FieldValue &field, bool validate = true);']
+
+# conversion of FieldValue into a member of each kind
+_FIELD_SET_CONVERSIONS = {
+    'bool': ['if (field.kind != kFieldBool) return false;',
+             '{ns}{type} member = field.boolean;'],
+    'integer': ['if (field.kind != kFieldInteger) return false;',
+                '{ns}{type} member = static_cast<{ns}{type}>(field.integer);',
+                'if (static_cast<int64_t>(member) != field.integer) return false;'],
+    'number': ['if (field.kind != kFieldNumber && field.kind != kFieldInteger) return false;',
+               '{ns}{type} member = field.kind == kFieldNumber ? field.number',
+               indent(': static_cast<double>(field.integer);', 2)],
+    'string': ['if (field.kind != kFieldString) return false;',
+               'const {ns}{type} &member = field.string;']}
+
+def _typed_field_definition(path):
+    """Create get and set of a bool, integer, number or string member."""
+    function_format_dict = {'index': path['index'], 'ns': path['namespace'],
+                            'type': path['typename'],
+                            'access': path['access'],
+                            'field': _FIELD_KINDS[path['kind']][1],
+                            'factory': ('Bool' if path['kind'] == 'bool'
+                                        else path['kind'].capitalize())}
+    lines = (['static bool {{typename}}Field{index}Get(const {{typename}} &value, FieldValue *field) {{lb}}',
+              indent('*field = FieldValue::{factory}(value.{access});'),
+              indent('return true;'),
+              '{{rb}}',
+              ('static bool {{typename}}Field{index}Set('
+               '{{typename}} *value, const FieldValue &field, bool validate) {{lb}}')]
+             + indent(_FIELD_SET_CONVERSIONS[path['kind']])
+             + indent(['if (validate && !{ns}Validate{type}(member)) return false;',
+                       'if (value->pre_update != NULL) {{lb}}',
+                       indent('{{typename}} new_value = *value;'),
+                       indent('new_value.{access} = member;'),
+                       indent('if (!(*value->pre_update)(*value, new_value)) return false;'),
+                       '{{rb}}',
+                       'value->{access} = member;',
+                       'return true;'])
+             + ['{{rb}}'])
+    return [line.format(**function_format_dict) for line in lines]
+
+def path_table_definition(paths, seeds, slots):
+    """Create accessors of paths and perfect hash table to find them.
+
+    paths is a list of dicts with 'path', 'access' (member expression
+    or None for the object itself), 'namespace' and 'typename' of the
+    member functions and 'kind' (schema type), seeds and slots are from
+    utils.perfect_hash. Members of simple types get typed get and set.
+
+    """
+    definition = []
+    entries = []
+    for index, path in enumerate(paths):
+        if path['access'] is None:
+            member, address = 'value', 'value'
+        else:
+            member = 'value.' + path['access']
+            address = '&value->' + path['access']
+        function_format_dict = {'index': index, 'member': member,
+                                'address': address, 'ns': path['namespace'],
+                                'type': path['typename']}
+        definition.extend([line.format(**function_format_dict) for line in [
+            ('static bool {{typename}}Field{index}ToJson('
+             'const {{typename}} &value, cJSON **node) {{lb}}'),
+            indent('return {ns}{type}ToJson({member}, node, false);'),
+            '{{rb}}',
+            ('static bool {{typename}}Field{index}FromJson('
+             'const cJSON *node, {{typename}} *value) {{lb}}'),
+            indent('return {ns}JsonTo{type}(node, {address});'),
+            '{{rb}}']])
+        if path.get('kind') in _FIELD_KINDS:
+            definition.extend(_typed_field_definition(dict(path, index=index)))
+            typed = ('{0}, &{{{{typename}}}}Field{{index}}Get, '
+                     '&{{{{typename}}}}Field{{index}}Set').format(
+                         _FIELD_KINDS[path['kind']][0])
+        else:
+            typed = 'kFieldOther, NULL, NULL'
+        entries.append(
+            ('{{lb}}"{path}", ' + typed + ', &{{typename}}Field{index}ToJson, '
+             '&{{typename}}Field{index}FromJson, &{ns}Validate{type}{{rb}},'
+             ).format(path=path['path'], **function_format_dict))
+    definition.append(
+        'static const FieldAccessor<{typename}> k{typename}Fields[] = {lb}')
+    definition.extend(indent(entries))
+    definition.extend([
+        '{rb};',
+        'static const uint64_t k{typename}FieldSeeds[] = {lb}'
+        + ', '.join(str(seed) for seed in seeds) + '{rb};',
+        'static const int k{typename}FieldSlots[] = {lb}'
+        + ', '.join(str(slot) for slot in slots) + '{rb};',
+        'const FieldAccessor<{typename}> *Find{typename}Field(const char *path, std::size_t length) {lb}',
+        indent('const std::size_t buckets = sizeof(k{typename}FieldSeeds) / sizeof(uint64_t);'),
+        indent('const std::size_t slots = sizeof(k{typename}FieldSlots) / sizeof(int);'),
+        indent('uint64_t hash = configen_hash::HashBytes(path, length, kHashBasis);'),
+        indent('uint64_t seed = k{typename}FieldSeeds[MixHash(hash) % buckets];'),
+        indent('const FieldAccessor<{typename}> *field ='),
+        indent('&k{typename}Fields[k{typename}FieldSlots[MixHash(hash ^ seed) % slots]];', 3),
+        indent('if (strncmp(field->path, path, length) != 0 || field->path[length] != 0) return NULL;'),
+        indent('return field;'),
+        '{rb}',
+        'bool Get{typename}Field(const {typename} &value, const std::string &path, std::string *json) {lb}',
+        indent('const FieldAccessor<{typename}> *field = Find{typename}Field(path.data(), path.size());'),
+        indent('if (field == NULL) return false;'),
+        indent('cJSON *node = NULL;'),
+        indent('if (!field->to_json(value, &node)) return false;'),
+        indent('*json = JsonToString(node);'),
+        indent('return true;'),
+        '{rb}',
+        'bool Set{typename}Field({typename} *value, const std::string &path, const std::string &json, bool validate) {lb}',
+        indent('const FieldAccessor<{typename}> *field = Find{typename}Field(path.data(), path.size());'),
+        indent('if (field == NULL) return false;'),
+        indent('cJSON *node = StringToJson(json);'),
+        indent('if (node == NULL) return false;'),
+        indent('bool rc = !validate || field->validate(node);'),
+        indent('if (rc && value->pre_update != NULL) {lb}'),
+        indent('{typename} new_value = *value;', 2),
+        indent('rc = field->from_json(node, &new_value)', 2),
+        indent('&& (*value->pre_update)(*value, new_value);', 4),
+        indent('if (rc) *value = new_value;', 2),
+        indent('{rb} else if (rc) {lb}'),
+        indent('rc = field->from_json(node, value);', 2),
+        indent('{rb}'),
+        indent('cJSON_Delete(node);'),
+        indent('return rc;'),
+        '{rb}',
+        'bool Get{typename}Field(const {typename} &value, const std::string &path, FieldValue *field) {lb}',
+        indent('const FieldAccessor<{typename}> *accessor = Find{typename}Field(path.data(), path.size());'),
+        indent('if (accessor == NULL || accessor->get == NULL) return false;'),
+        indent('return accessor->get(value, field);'),
+        '{rb}',
+        'bool Set{typename}Field({typename} *value, const std::string &path, const FieldValue &field, bool validate) {lb}',
+        indent('const FieldAccessor<{typename}> *accessor = Find{typename}Field(path.data(), path.size());'),
+        indent('if (accessor == NULL || accessor->set == NULL) return false;'),
+        indent('return accessor->set(value, field, validate);'),
+        '{rb}'])
+    return definition
+
+# ==================== instrumentation ====================
+
+# function definition start -> (function family, count visited node)
+_INSTRUMENTED_FUNCTIONS = [
+    ('bool {namespace}JsonTo{typename}(', 'JsonTo', True),
+    ('bool {namespace}{typename}ToJson(', 'ToJson', True),
+    ('bool {namespace}Validate{typename}(const cJSON *', 'ValidateJson', True),
+    ('bool {namespace}Validate{typename}(const {namespace}', 'Validate', False)]
+
+def _instrument_macro(family):
+    return 'CONFIGEN_INSTRUMENT("{0}", "{{namespace}}{{typename}}");'.format(
+        family)
+
+def instrument_definitions(definitions):
+    """Insert instrumentation macros at the start of instrumented functions.
+
+    Only definitions of a single type must be passed, definitions of
+    members are instrumented when their code is generated.
+
+    """
+    instrumented = []
+    for line in definitions:
+        instrumented.append(line)
+        for start, family, visits_node in _INSTRUMENTED_FUNCTIONS:
+            if line.startswith(start):
+                instrumented.append(indent(_instrument_macro(family)))
+                if visits_node:
+                    instrumented.append(indent('CONFIGEN_INSTRUMENT_NODES(1);'))
+                break
+    return instrumented
+
+def instrumentation_declaration():
+    """Generate counters and macros, macros are empty unless enabled."""
+    return (['#ifdef CONFIGEN_INSTRUMENTATION',
+             'struct InstrumentCounter {lb}']
+            + indent(['const char *function;',
+                      'const char *type_name;',
+                      'uint64_t calls;',
+                      'uint64_t nodes;',
+                      'uint64_t bytes;',
+                      'uint64_t nanoseconds;',
+                      'InstrumentCounter *next;',
+                      'bool registered;'])
+            + ['{rb};',
+               'uint64_t InstrumentNow();',
+               'void RegisterInstrumentCounter(InstrumentCounter *counter);',
+               'class InstrumentScope {lb}',
+               ' public:',
+               indent('explicit InstrumentScope(InstrumentCounter *counter)'),
+               indent(': counter_(counter), start_(InstrumentNow()) {lb}', 3),
+               indent('if (!counter->registered) RegisterInstrumentCounter(counter);', 2),
+               indent('++counter->calls;', 2),
+               indent('{rb}'),
+               indent('~InstrumentScope() {lb}'),
+               indent('counter_->nanoseconds += InstrumentNow() - start_;', 2),
+               indent('{rb}'),
+               ' private:',
+               indent('InstrumentCounter *counter_;'),
+               indent('uint64_t start_;'),
+               '{rb};',
+               '#define CONFIGEN_INSTRUMENT(function, type_name) \\',
+               indent('static InstrumentCounter configen_counter_ = \\', 2),
+               indent('{lb}function, type_name, 0, 0, 0, 0, NULL, false{rb}; \\', 4),
+               indent('InstrumentScope configen_scope_(&configen_counter_)', 2),
+               '#define CONFIGEN_INSTRUMENT_NODES(count) configen_counter_.nodes += (count)',
+               '#define CONFIGEN_INSTRUMENT_BYTES(count) configen_counter_.bytes += (count)',
+               '#else',
+               '#define CONFIGEN_INSTRUMENT(function, type_name)',
+               '#define CONFIGEN_INSTRUMENT_NODES(count)',
+               '#define CONFIGEN_INSTRUMENT_BYTES(count)',
+               '#endif',
+               'std::string DumpInstrumentation();',
+               'void ResetInstrumentation();'])
+
+def instrumentation_definition():
+    return (['#ifdef CONFIGEN_INSTRUMENTATION',
+             'static InstrumentCounter *instrument_counters = NULL;',
+             'uint64_t InstrumentNow() {lb}',
+             indent('struct timespec now;'),
+             indent('clock_gettime(CLOCK_MONOTONIC, &now);'),
+             indent('return static_cast<uint64_t>(now.tv_sec) * 1000000000 + now.tv_nsec;'),
+             '{rb}',
+             'void RegisterInstrumentCounter(InstrumentCounter *counter) {lb}',
+             indent('counter->registered = true;'),
+             indent('counter->next = instrument_counters;'),
+             indent('instrument_counters = counter;'),
+             '{rb}',
+             'static std::string InstrumentNumber(uint64_t value) {lb}',
+             indent('char digits[21];'),
+             indent('int i = sizeof(digits) - 1;'),
+             indent('digits[i] = 0;'),
+             indent('do {lb}'),
+             indent('digits[--i] = static_cast<char>(\'0\' + value % 10);', 2),
+             indent('value /= 10;', 2),
+             indent('{rb} while (value != 0);'),
+             indent('return std::string(digits + i);'),
+             '{rb}',
+             'std::string DumpInstrumentation() {lb}',
+             indent('std::string dump = "type function calls nodes bytes nanoseconds\\n";'),
+             indent('for (InstrumentCounter *counter = instrument_counters; counter;'),
+             indent('counter = counter->next) {lb}', 3)]
+            + indent(['dump += std::string(counter->type_name) + " " + counter->function;',
+                      'dump += " " + InstrumentNumber(counter->calls);',
+                      'dump += " " + InstrumentNumber(counter->nodes);',
+                      'dump += " " + InstrumentNumber(counter->bytes);',
+                      'dump += " " + InstrumentNumber(counter->nanoseconds) + "\\n";'], 2)
+            + [indent('{rb}'),
+               indent('return dump;'),
+               '{rb}',
+               'void ResetInstrumentation() {lb}',
+               indent('for (InstrumentCounter *counter = instrument_counters; counter;'),
+               indent('counter = counter->next) {lb}', 3)]
+            + indent(['counter->calls = 0;',
+                      'counter->nodes = 0;',
+                      'counter->bytes = 0;',
+                      'counter->nanoseconds = 0;'], 2)
+            + [indent('{rb}'),
+               '{rb}',
+               '#else',
+               'std::string DumpInstrumentation() {lb}',
+               indent('return std::string();'),
+               '{rb}',
+               'void ResetInstrumentation() {lb}',
+               '{rb}',
+               '#endif'])
+
+# ==================== snapshots ====================
+
+def snapshot_header_includes():
+    return ['#if defined(_MSC_VER)',
+            '#include <intrin.h>',
+            '#endif']
+
+def snapshot_source_includes():
+    return ['#if defined(_WIN32)',
+            '#include <windows.h>',
+            '#else',
+            '#include <sched.h>',
+            '#endif']
+
+def snapshot_declaration():
+    """Generate atomics shim and holder template for hot reloaded configs.
+
+    Readers get reference counted immutable snapshots without locks.
+    Publishing swaps the current value and waits until readers that may
+    have seen the old pointer took their reference (two reader counters
+    selected by epoch parity), then drops the holder reference. Values
+    are validated before they are published, that loads lazy members,
+    readers would change them on first access otherwise.
+
+    """
+    return (['#if defined(__GNUC__)',
+             'inline long AtomicAdd(volatile long *value, long delta) {lb}',
+             indent('return __sync_add_and_fetch(value, delta);'),
+             '{rb}',
+             'inline void *AtomicCompareExchange(void *volatile *target, void *expected, void *value) {lb}',
+             indent('return __sync_val_compare_and_swap(target, expected, value);'),
+             '{rb}',
+             '#elif defined(_MSC_VER)',
+             'inline long AtomicAdd(volatile long *value, long delta) {lb}',
+             indent('return _InterlockedExchangeAdd(value, delta) + delta;'),
+             '{rb}',
+             'inline void *AtomicCompareExchange(void *volatile *target, void *expected, void *value) {lb}',
+             indent('return _InterlockedCompareExchangePointer(target, value, expected);'),
+             '{rb}',
+             '#else',
+             '#error "no atomic operations for this compiler"',
+             '#endif',
+             'inline long AtomicLoad(volatile long *value) {lb}',
+             indent('return AtomicAdd(value, 0);'),
+             '{rb}',
+             'inline void *AtomicLoadPointer(void *volatile *target) {lb}',
+             indent('return AtomicCompareExchange(target, NULL, NULL);'),
+             '{rb}',
+             'inline void *AtomicExchangePointer(void *volatile *target, void *value) {lb}',
+             indent('void *old;'),
+             indent('do {lb}'),
+             indent('old = AtomicLoadPointer(target);', 2),
+             indent('{rb} while (AtomicCompareExchange(target, old, value) != old);'),
+             indent('return old;'),
+             '{rb}',
+             'void SnapshotYield();',
+             '',
+             'template <class T> class SnapshotHolder {lb}',
+             ' private:',
+             indent('struct Node {lb}'),
+             indent('Node() : references(1) {lb}{rb}', 2),
+             indent('explicit Node(const T &new_value) : value(new_value), references(1) {lb}{rb}', 2),
+             indent('T value;', 2),
+             indent('volatile long references;', 2),
+             indent('{rb};'),
+             indent('static void Release(Node *node) {lb}'),
+             indent('if (node != NULL && AtomicAdd(&node->references, -1) == 0) delete node;', 2),
+             indent('{rb}'),
+             '',
+             ' public:',
+             indent('// Immutable value shared by copies, valid while any copy exists.'),
+             indent('class Snapshot {lb}'),
+             indent(' public:'),
+             indent('Snapshot() : node_(NULL) {lb}{rb}', 2),
+             indent('Snapshot(const Snapshot &other) : node_(other.node_) {lb}', 2),
+             indent('if (node_ != NULL) AtomicAdd(&node_->references, 1);', 3),
+             indent('{rb}', 2),
+             indent('Snapshot &operator=(const Snapshot &other) {lb}', 2),
+             indent('Snapshot copy(other);', 3),
+             indent('Node *node = node_;', 3),
+             indent('node_ = copy.node_;', 3),
+             indent('copy.node_ = node;', 3),
+             indent('return *this;', 3),
+             indent('{rb}', 2),
+             indent('~Snapshot() {lb}', 2),
+             indent('Release(node_);', 3),
+             indent('{rb}', 2),
+             indent('const T &operator*() const {lb} return node_->value; {rb}', 2),
+             indent('const T *operator->() const {lb} return &node_->value; {rb}', 2),
+             indent(' private:'),
+             indent('friend class SnapshotHolder;', 2),
+             indent('explicit Snapshot(Node *node) : node_(node) {lb}{rb}', 2),
+             indent('Node *node_;', 2),
+             indent('{rb};'),
+             '',
+             indent('SnapshotHolder() : current_(new Node(T())), epoch_(0), writer_(0) {lb}'),
+             indent('readers_[0] = 0;', 2),
+             indent('readers_[1] = 0;', 2),
+             indent('{rb}'),
+             indent('~SnapshotHolder() {lb}'),
+             indent('Release(static_cast<Node *>(current_));', 2),
+             indent('{rb}'),
+             indent('// Lock free, safe to call from any number of threads.'),
+             indent('Snapshot Get() const {lb}'),
+             indent('for (;;) {lb}', 2),
+             indent('long parity = AtomicLoad(&epoch_) & 1;', 3),
+             indent('AtomicAdd(&readers_[parity], 1);', 3),
+             indent('if ((AtomicLoad(&epoch_) & 1) == parity) {lb}', 3),
+             indent('Node *node = static_cast<Node *>(AtomicLoadPointer(&current_));', 4),
+             indent('AtomicAdd(&node->references, 1);', 4),
+             indent('AtomicAdd(&readers_[parity], -1);', 4),
+             indent('return Snapshot(node);', 4),
+             indent('{rb}', 3),
+             indent('AtomicAdd(&readers_[parity], -1);', 3),
+             indent('{rb}', 2),
+             indent('{rb}'),
+             indent('// Make value current, readers see either old or new value. Lazy'),
+             indent('// members are loaded by validation, the value is published even'),
+             indent('// if it is not valid.'),
+             indent('void Publish(const T &value) {lb}'),
+             indent('Node *node = new Node(value);', 2),
+             indent('node->value.IsValid();', 2),
+             indent('Swap(node);', 2),
+             indent('{rb}'),
+             indent('// Parse and validate new value, publish it if it is correct.'),
+             indent('bool Reload(const std::string &serialized) {lb}'),
+             indent('Node *node = new Node();', 2),
+             indent('if (!node->value.FromString(serialized) || !node->value.IsValid()) {lb}', 2),
+             indent('delete node;', 3),
+             indent('return false;', 3),
+             indent('{rb}', 2),
+             indent('Swap(node);', 2),
+             indent('return true;', 2),
+             indent('{rb}'),
+             indent('bool ReloadFromFile(const std::string &path) {lb}'),
+             indent('Node *node = new Node();', 2),
+             indent('if (!node->value.LoadFromFile(path) || !node->value.IsValid()) {lb}', 2),
+             indent('delete node;', 3),
+             indent('return false;', 3),
+             indent('{rb}', 2),
+             indent('Swap(node);', 2),
+             indent('return true;', 2),
+             indent('{rb}'),
+             '',
+             ' private:',
+             indent('void Swap(Node *node) {lb}'),
+             indent('while (AtomicCompareExchange(&writer_, NULL, this) != NULL) SnapshotYield();', 2),
+             indent('Node *old = static_cast<Node *>(AtomicExchangePointer(&current_, node));', 2),
+             indent('long parity = (AtomicAdd(&epoch_, 1) - 1) & 1;', 2),
+             indent('while (AtomicLoad(&readers_[parity]) != 0) SnapshotYield();', 2),
+             indent('AtomicExchangePointer(&writer_, NULL);', 2),
+             indent('Release(old);', 2),
+             indent('{rb}'),
+             indent('SnapshotHolder(const SnapshotHolder &);'),
+             indent('SnapshotHolder &operator=(const SnapshotHolder &);'),
+             indent('mutable void *volatile current_;'),
+             indent('mutable volatile long epoch_;'),
+             indent('mutable volatile long readers_[2];'),
+             indent('void *volatile writer_;'),
+             '{rb};'])
+
+def snapshot_definition():
+    return ['void SnapshotYield() {lb}',
+            '#if defined(_WIN32)',
+            indent('SwitchToThread();'),
+            '#else',
+            indent('sched_yield();'),
+            '#endif',
+            '{rb}']
+
+def snapshot_holder_declaration():
+    return ['typedef SnapshotHolder<{typename}> {typename}Holder;']
 
 def json_to_string_declaration():
     """Generate function that convert json node to string and cleans up."""
@@ -699,6 +1920,228 @@ def json_to_string_definition():
             indent('cJSON_Delete(node);'),
             indent('return serialized;'),
             '{rb}']
+def prototype_tag_declaration():
+    return ['// Selects constructor that builds the default value of a type.',
+            'struct PrototypeTag {lb}{rb};']
+
+def file_io_includes():
+    """Generate includes for file access, memory mapping if available."""
+    return ['#include <stdio.h>',
+            '#if defined(__unix__) || defined(__APPLE__)',
+            '#ifndef CONFIGEN_HAVE_MMAP',
+            '#define CONFIGEN_HAVE_MMAP',
+            '#endif',
+            '#include <fcntl.h>',
+            '#include <sys/mman.h>',
+            '#include <sys/stat.h>',
+            '#include <unistd.h>',
+            '#endif',
+            '// cJSON_ParseWithLength is in cJSON 1.7.13 and newer',
+            '#if defined(CJSON_VERSION_MAJOR) && (CJSON_VERSION_MAJOR * 10000 \\',
+            '    + CJSON_VERSION_MINOR * 100 + CJSON_VERSION_PATCH >= 10713)',
+            '#ifndef CONFIGEN_HAVE_PARSE_WITH_LENGTH',
+            '#define CONFIGEN_HAVE_PARSE_WITH_LENGTH',
+            '#endif',
+            '#endif']
+
+def file_io_declaration():
+    """Generate functions that parse buffers and files and write files."""
+    return ['cJSON *BufferToJson(const char *data, std::size_t length);',
+            'cJSON *FileToJson(const std::string &path);',
+            'bool WriteFileAtomically(const std::string &path, const std::string &content);']
+
+def file_io_definition():
+    """Generate buffer and file parsing and atomic file writing.
+
+    Files are memory mapped only if cJSON parses a buffer of given
+    length, the mapping is not terminated and cJSON_Parse would read past
+    it. Files are written to a unique temporary file next to the target
+    and renamed over it, so a mapped file is replaced, not truncated.
+
+    """
+    return ['cJSON *BufferToJson(const char *data, std::size_t length) {lb}',
+            indent('if (data == NULL || length == 0) return NULL;'),
+            '#ifdef CONFIGEN_HAVE_PARSE_WITH_LENGTH',
+            indent('return cJSON_ParseWithLength(data, length);'),
+            '#else',
+            indent('// cJSON reads up to the terminating zero, parse in place if present'),
+            indent('if (data[length - 1] == 0) return cJSON_Parse(data);'),
+            indent('std::vector<char> terminated(data, data + length);'),
+            indent('terminated.push_back(0);'),
+            indent('return cJSON_Parse(&terminated[0]);'),
+            '#endif',
+            '{rb}',
+            'cJSON *FileToJson(const std::string &path) {lb}',
+            '#if defined(CONFIGEN_HAVE_MMAP) && defined(CONFIGEN_HAVE_PARSE_WITH_LENGTH)',
+            indent('int fd = open(path.c_str(), O_RDONLY);'),
+            indent('if (fd == -1) return NULL;'),
+            indent('struct stat info;'),
+            indent('if (fstat(fd, &info) == 0 && info.st_size > 0) {lb}'),
+            indent('// parsed in place, no further than the size of the file', 2),
+            indent('std::size_t size = info.st_size;', 2),
+            indent('void *data = mmap(NULL, size, PROT_READ, MAP_PRIVATE, fd, 0);', 2),
+            indent('if (data != MAP_FAILED) {lb}', 2),
+            indent('close(fd);', 3),
+            indent('cJSON *node = cJSON_ParseWithLength(static_cast<const char *>(data), size);', 3),
+            indent('munmap(data, size);', 3),
+            indent('return node;', 3),
+            indent('{rb}', 2),
+            indent('{rb}'),
+            indent('close(fd);'),
+            '#endif',
+            indent('FILE *file = fopen(path.c_str(), "rb");'),
+            indent('if (file == NULL) return NULL;'),
+            indent('std::vector<char> content;'),
+            indent('char buffer[4096];'),
+            indent('std::size_t length;'),
+            indent('while ((length = fread(buffer, 1, sizeof(buffer), file)) > 0) {lb}'),
+            indent('content.insert(content.end(), buffer, buffer + length);', 2),
+            indent('{rb}'),
+            indent('bool failed = ferror(file) != 0;'),
+            indent('fclose(file);'),
+            indent('if (failed) return NULL;'),
+            indent('content.push_back(0);'),
+            indent('return cJSON_Parse(&content[0]);'),
+            '{rb}',
+            'bool WriteFileAtomically(const std::string &path, const std::string &content) {lb}',
+            indent('if (content.empty()) return false;'),
+            '#ifdef CONFIGEN_HAVE_MMAP',
+            indent('// unique name in the same directory, rename stays on one file system'),
+            indent('std::string temp_path = path + ".XXXXXX";'),
+            indent('std::vector<char> temp_name(temp_path.begin(), temp_path.end());'),
+            indent('temp_name.push_back(0);'),
+            indent('int fd = mkstemp(&temp_name[0]);'),
+            indent('if (fd == -1) return false;'),
+            indent('temp_path = &temp_name[0];'),
+            indent('// mkstemp creates files readable by the owner only, keep the mode'),
+            indent('// of the replaced file'),
+            indent('struct stat info;'),
+            indent('fchmod(fd, stat(path.c_str(), &info) == 0 ? info.st_mode & 07777 : 0644);'),
+            indent('FILE *file = fdopen(fd, "wb");'),
+            indent('if (file == NULL) {lb}'),
+            indent('close(fd);', 2),
+            indent('remove(temp_path.c_str());', 2),
+            indent('return false;', 2),
+            indent('{rb}'),
+            '#else',
+            indent('std::string temp_path = path + ".tmp";'),
+            indent('FILE *file = fopen(temp_path.c_str(), "wb");'),
+            indent('if (file == NULL) return false;'),
+            '#endif',
+            indent('bool ok = fwrite(content.data(), 1, content.size(), file) == content.size();'),
+            indent('ok = fflush(file) == 0 && ok;'),
+            '#ifdef CONFIGEN_HAVE_MMAP',
+            indent('ok = ok && fsync(fileno(file)) == 0;'),
+            '#endif',
+            indent('ok = fclose(file) == 0 && ok;'),
+            indent('if (ok && rename(temp_path.c_str(), path.c_str()) == 0) return true;'),
+            indent('remove(temp_path.c_str());'),
+            indent('return false;'),
+            '{rb}']
+
+def records_declaration():
+    """Generate batch parsing of many records of a type into a vector.
+
+    Records are values of the type without the {"type_name": ...}
+    wrapper, one per line (NDJSON) or elements of a JSON array.
+
+    """
+    return ['// Split NDJSON buffer into parsed records, a broken record is skipped',
+            '// up to the next new line.',
+            'class RecordReader {lb}',
+            ' public:',
+            indent('RecordReader(const char *data, std::size_t length);'),
+            indent('// Return false at the end of data, otherwise *node is the parsed'),
+            indent('// record or NULL if it is broken, delete it with cJSON_Delete.'),
+            indent('bool Next(cJSON **node);'),
+            ' private:',
+            indent('std::vector<char> terminated_;'),
+            indent('const char *position_;'),
+            indent('const char *end_;'),
+            '{rb};',
+            'template <class T>',
+            'bool ReuseRecord(const cJSON *node, bool validate, std::size_t count,',
+            indent('std::vector<T> *records) {lb}', 4),
+            indent('if (node == NULL || (validate && !T::IsJsonValid(node))) return false;'),
+            indent('if (count == records->size()) records->push_back(T::Prototype());'),
+            indent('else (*records)[count] = T::Prototype();'),
+            indent('return (*records)[count].FromJson(node);'),
+            '{rb}',
+            '// Parse records into records, reusing its elements and capacity.',
+            '// Indexes of records that failed to parse, validate or convert are',
+            '// stored in failed if it is not NULL, return number of parsed records.',
+            'template <class T>',
+            'std::size_t RecordsFromNdjson(const char *data, std::size_t length,',
+            indent('std::vector<T> *records,', 8),
+            indent('std::vector<std::size_t> *failed = NULL,', 8),
+            indent('bool validate = true) {lb}', 8),
+            indent('if (failed != NULL) failed->clear();'),
+            indent('RecordReader reader(data, length);'),
+            indent('std::size_t count = 0;'),
+            indent('cJSON *node;'),
+            indent('for (std::size_t i = 0; reader.Next(&node); ++i) {lb}'),
+            indent('if (ReuseRecord(node, validate, count, records)) ++count;', 2),
+            indent('else if (failed != NULL) failed->push_back(i);', 2),
+            indent('cJSON_Delete(node);', 2),
+            indent('{rb}'),
+            indent('records->erase(records->begin() + count, records->end());'),
+            indent('return count;'),
+            '{rb}',
+            'template <class T>',
+            'std::size_t RecordsFromJsonArray(const char *data, std::size_t length,',
+            indent('std::vector<T> *records,', 8),
+            indent('std::vector<std::size_t> *failed = NULL,', 8),
+            indent('bool validate = true) {lb}', 8),
+            indent('if (failed != NULL) failed->clear();'),
+            indent('std::size_t count = 0;'),
+            indent('cJSON *document = BufferToJson(data, length);'),
+            indent('if (document != NULL && document->type == cJSON_Array) {lb}'),
+            indent('std::size_t i = 0;', 2),
+            indent('for (cJSON *node = document->child; node; node = node->next, ++i) {lb}', 2),
+            indent('if (ReuseRecord(node, validate, count, records)) ++count;', 3),
+            indent('else if (failed != NULL) failed->push_back(i);', 3),
+            indent('{rb}', 2),
+            indent('{rb}'),
+            indent('cJSON_Delete(document);'),
+            indent('records->erase(records->begin() + count, records->end());'),
+            indent('return count;'),
+            '{rb}']
+
+def records_definition():
+    return ['RecordReader::RecordReader(const char *data, std::size_t length)',
+            indent(': position_(data), end_(data + length) {lb}', 2),
+            indent('// cJSON reads up to the terminating zero, copy if it is missing'),
+            indent('if (length != 0 && data[length - 1] != 0) {lb}'),
+            indent('terminated_.assign(data, data + length);', 2),
+            indent('terminated_.push_back(0);', 2),
+            indent('position_ = &terminated_[0];', 2),
+            indent('end_ = position_ + length;', 2),
+            indent('{rb}'),
+            '{rb}',
+            'bool RecordReader::Next(cJSON **node) {lb}',
+            indent('while (position_ != end_ && (*position_ == 0 || isspace(static_cast<unsigned char>(*position_)))) {lb}'),
+            indent('++position_;', 2),
+            indent('{rb}'),
+            indent('if (position_ == end_) return false;'),
+            indent('const char *line_end = static_cast<const char *>('),
+            indent('memchr(position_, \'\\n\', end_ - position_));', 3),
+            indent('if (line_end == NULL) line_end = end_;'),
+            indent('const char *parse_end = NULL;'),
+            indent('*node = cJSON_ParseWithOpts(position_, &parse_end, 0);'),
+            indent('// record must end on its own line, only white space may follow'),
+            indent('if (*node != NULL) {lb}'),
+            indent('while (parse_end < line_end && isspace(static_cast<unsigned char>(*parse_end))) {lb}', 2),
+            indent('++parse_end;', 3),
+            indent('{rb}', 2),
+            indent('if (parse_end != line_end) {lb}', 2),
+            indent('cJSON_Delete(*node);', 3),
+            indent('*node = NULL;', 3),
+            indent('{rb}', 2),
+            indent('{rb}'),
+            indent('position_ = line_end;'),
+            indent('return true;'),
+            '{rb}']
+
 def string_to_json_declaration():
     """Generate function that convert a string to a json node which must be deleted."""
     return ['cJSON *StringToJson(const std::string &serialized);']
@@ -0,0 +1,53 @@
+"""Collect generator phase timings and generated code sizes."""
+
+from contextlib import contextmanager
+import time
+
+
+class Profile(object):
+    """Wall time of generation phases and size of code of every type."""
+
+    def __init__(self):
+        self.phases = [] # list of (phase name, seconds) in run order
+        self.types = {} # type name -> dict with lines, bytes, functions
+
+    def add_phase(self, name, seconds):
+        self.phases.append((name, seconds))
+
+    def add_type(self, name, lines, bytes, functions):
+        self.types[name] = {'lines': lines, 'bytes': bytes,
+                            'functions': functions}
+
+    def to_json(self):
+        return {'phases': [{'name': name, 'seconds': seconds}
+                           for name, seconds in self.phases],
+                'types': self.types}
+
+    def report(self):
+        """Return human readable report, biggest types first."""
+        lines = ['phase                                    seconds']
+        for name, seconds in self.phases:
+            lines.append('{0:<40} {1:.6f}'.format(name, seconds))
+        lines.append('{0:<40} {1:.6f}'.format(
+            'total', sum(seconds for _, seconds in self.phases)))
+        lines.append('')
+        lines.append('type                               lines      bytes'
+                     '  functions')
+        for name, size in sorted(self.types.items(),
+                                 key=lambda item: -item[1]['bytes']):
+            lines.append('{0:<30} {1:>9} {2:>10} {3:>10}'.format(
+                name, size['lines'], size['bytes'], size['functions']))
+        return '\n'.join(lines)
+
+
+@contextmanager
+def phase(profile, name):
+    """Time the block as phase name, does nothing if profile is None."""
+    if profile is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.add_phase(name, time.perf_counter() - start)
@@ -0,0 +1,285 @@
+"""Generate random JSON configs from a schema.
+
+The schema is compiled once into closures, like in configen.validate,
+that produce values following the same rules as generated Validate
+functions: type, minimum/maximum for variables, minItems/maxItems for
+arrays, references to top level types. Members with a default get it
+with probability DEFAULT_RATIO. Invalid values break exactly one rule at
+one randomly chosen place of the document. Documents have the layout
+accepted by generated FromString: {"type_name": value}.
+
+"""
+
+import json
+import math
+import random
+
+import configen.library as cl
+import configen.parts_cpp as cpp
+import configen.validate as cv
+
+# probability that a variable with default gets it
+DEFAULT_RATIO = 0.25
+# generated code reads integers through cJSON valueint, a c++ int
+_INTEGER_RANGE = (-2 ** 31, 2 ** 31 - 1)
+# range of numbers without minimum/maximum
+_NUMBER_RANGE = (-1e6, 1e6)
+# arrays without maxItems have up to minItems + _EXTRA_ITEMS elements
+_EXTRA_ITEMS = 8
+# deeper arrays get minItems elements, this stops recursive references
+_MAX_DEPTH = 32
+_STRING_CHARACTERS = 'abcdefghijklmnopqrstuvwxyz0123456789_'
+_MAX_STRING_LENGTH = 16
+
+# value of wrong type for each schema type
+_WRONG_TYPE_VALUES = {'bool': 0, 'integer': 'x', 'number': 'x',
+                      'string': 1, 'object': [], 'array': {}}
+
+
+class _Sampler(object):
+    """Pair of closures valid(rng, depth) and invalid(rng, depth)."""
+
+    def __init__(self, valid, invalid):
+        self.valid = valid
+        self.invalid = invalid
+
+
+def _integer_limits(schema):
+    """Range of the generated c++ type, read through the int valueint."""
+    low, high = cpp.integer_limits(schema)
+    return max(low, _INTEGER_RANGE[0]), min(high, _INTEGER_RANGE[1])
+
+
+def _with_default(schema, valid):
+    if 'default' not in schema:
+        return valid
+    default = schema['default']
+
+    def sample(rng, depth):
+        if rng.random() < DEFAULT_RATIO:
+            return default
+        return valid(rng, depth)
+    return sample
+
+
+def _compile_variable(schema):
+    variable_type = schema['type']
+    minimum = schema.get('minimum')
+    maximum = schema.get('maximum')
+    if variable_type == 'bool':
+        valid = lambda rng, depth: rng.random() < 0.5
+    elif variable_type == 'integer':
+        type_low, type_high = _integer_limits(schema)
+        low = max(type_low, int(math.ceil(minimum)) if minimum is not None
+                  else type_low)
+        high = min(type_high, int(math.floor(maximum)) if maximum is not None
+                   else type_high)
+        valid = lambda rng, depth: rng.randint(low, high)
+    elif variable_type == 'number':
+        low, high = _NUMBER_RANGE
+        span = high - low
+        if minimum is not None:
+            low, high = minimum, minimum + span
+        if maximum is not None:
+            low, high = (minimum if minimum is not None
+                         else maximum - span), maximum
+        valid = lambda rng, depth: rng.uniform(low, high)
+    else:
+        def valid(rng, depth):
+            return ''.join(rng.choice(_STRING_CHARACTERS) for _ in
+                           range(rng.randint(0, _MAX_STRING_LENGTH)))
+    wrong_type = _WRONG_TYPE_VALUES[variable_type]
+    ways = [lambda rng: wrong_type]
+    if variable_type == 'integer':
+        # out of range values must fit the c++ type, otherwise they wrap
+        # back into the range when converted
+        if minimum is not None and math.ceil(minimum) - 1 >= type_low:
+            below = (max(type_low, int(math.ceil(minimum)) - 100),
+                     int(math.ceil(minimum)) - 1)
+            ways.append(lambda rng: rng.randint(*below))
+        if maximum is not None and math.floor(maximum) + 1 <= type_high:
+            above = (int(math.floor(maximum)) + 1,
+                     min(type_high, int(math.floor(maximum)) + 100))
+            ways.append(lambda rng: rng.randint(*above))
+    elif variable_type == 'number':
+        if minimum is not None:
+            ways.append(lambda rng: math.ceil(minimum) - rng.randint(1, 100))
+        if maximum is not None:
+            ways.append(lambda rng: math.floor(maximum) + rng.randint(1, 100))
+
+    def invalid(rng, depth):
+        return rng.choice(ways)(rng)
+    return _Sampler(_with_default(schema, valid), invalid)
+
+
+def _compile_object(schema, samplers, type_path):
+    members = dict(
+        (name, compile_schema(
+            member_schema, samplers,
+            type_path + '.' + name if type_path is not None else None))
+        for name, member_schema in schema['properties'].items())
+    breakable = tuple(name for name, sampler in members.items()
+                      if sampler.invalid is not None)
+
+    def valid(rng, depth):
+        return {name: sampler.valid(rng, depth + 1)
+                for name, sampler in members.items()}
+
+    def invalid_member(rng, depth):
+        value = valid(rng, depth)
+        name = rng.choice(breakable)
+        value[name] = members[name].invalid(rng, depth + 1)
+        return value
+
+    ways = [lambda rng, depth: _WRONG_TYPE_VALUES['object']]
+    if breakable:
+        # mostly break something inside
+        ways.extend([invalid_member] * 4)
+
+    def invalid(rng, depth):
+        return rng.choice(ways)(rng, depth)
+    return _Sampler(valid, invalid)
+
+
+def _compile_array(schema, samplers):
+    min_items = schema.get('minItems', 0)
+    max_items = schema.get('maxItems', min_items + _EXTRA_ITEMS)
+    element = compile_schema(schema['items'], samplers)
+
+    def valid(rng, depth):
+        length = (min_items if depth > _MAX_DEPTH
+                  else rng.randint(min_items, max_items))
+        return [element.valid(rng, depth + 1) for _ in range(length)]
+
+    def too_short(rng, depth):
+        return [element.valid(rng, depth + 1)
+                for _ in range(rng.randint(0, min_items - 1))]
+
+    def too_long(rng, depth):
+        return [element.valid(rng, depth + 1)
+                for _ in range(max_items + rng.randint(1, _EXTRA_ITEMS))]
+
+    def invalid_element(rng, depth):
+        value = valid(rng, depth)
+        if not value:
+            return [element.invalid(rng, depth + 1)]
+        value[rng.randrange(len(value))] = element.invalid(rng, depth + 1)
+        return value
+
+    ways = [lambda rng, depth: _WRONG_TYPE_VALUES['array']]
+    if min_items > 0:
+        ways.append(too_short)
+    if 'maxItems' in schema:
+        ways.append(too_long)
+    if element.invalid is not None:
+        ways.extend([invalid_element] * 2)
+
+    def invalid(rng, depth):
+        return rng.choice(ways)(rng, depth)
+    return _Sampler(valid, invalid)
+
+
+def _compile_reference(schema, samplers):
+    name = schema['$ref']
+
+    # resolved on call, referenced type may be compiled later
+    def valid(rng, depth):
+        return samplers[name].valid(rng, depth)
+
+    def invalid(rng, depth):
+        if samplers[name].invalid is None:
+            return valid(rng, depth)
+        return samplers[name].invalid(rng, depth)
+    return _Sampler(valid, invalid)
+
+
+def _any_value(rng, depth):
+    return None
+
+
+def _compile_type(schema, samplers, type_path):
+    if 'type' in schema:
+        if schema['type'] in ('bool', 'integer', 'number', 'string'):
+            return _compile_variable(schema)
+        if schema['type'] == 'object':
+            return _compile_object(schema, samplers, type_path)
+        if schema['type'] == 'array':
+            return _compile_array(schema, samplers)
+    if '$ref' in schema:
+        return _compile_reference(schema, samplers)
+    # unknown type, same as generator that produces no code for it
+    return _Sampler(_any_value, None)
+
+
+def compile_schema(schema, samplers, type_path=None):
+    """Compile schema subtree into _Sampler.
+
+    samplers is a dict type path -> _Sampler used to resolve references,
+    members of objects are added under their dotted type path when
+    type_path of the subtree is given. invalid of the sampler is None if
+    nothing can be invalid in the subtree.
+
+    """
+    sampler = _compile_type(schema, samplers, type_path)
+    if type_path is not None:
+        samplers[type_path] = sampler
+    return sampler
+
+
+def compile_samplers(schema, libraries=None):
+    """Compile all types, return dict type path -> _Sampler.
+
+    Members of objects are added by dotted path, types of libraries as
+    "library#type".
+
+    """
+    samplers = {}
+    for library in libraries or []:
+        for name, sampler in compile_samplers(library['schema']).items():
+            samplers[cl.qualified_name(library['name'], name)] = sampler
+    for name, object_schema in schema.items():
+        compile_schema(object_schema, samplers, name)
+    unresolved = cv.collect_references(schema, set()) - set(samplers)
+    if unresolved:
+        raise ValueError('unresolved references: '
+                         + ', '.join(sorted(unresolved)))
+    return samplers
+
+
+def sample_documents(schema, count, seed=None, type_name=None,
+                     invalid_ratio=0.0, libraries=None):
+    """Yield count random documents.
+
+    Every document contains type_name or all top level types. With
+    probability invalid_ratio a document is invalid, one value of one
+    of its types breaks one rule. The same seed gives the same
+    documents.
+
+    """
+    samplers = compile_samplers(schema, libraries)
+    names = [type_name] if type_name is not None else list(schema)
+    breakable = [name for name in names if samplers[name].invalid is not None]
+    rng = random.Random(seed)
+    for _ in range(count):
+        document = {name: samplers[name].valid(rng, 0) for name in names}
+        if breakable and rng.random() < invalid_ratio:
+            name = rng.choice(breakable)
+            document[name] = samplers[name].invalid(rng, 0)
+        yield document
+
+
+def write_ndjson(documents, output):
+    """Write one compact document per line."""
+    for document in documents:
+        output.write(json.dumps(document, separators=(',', ':')))
+        output.write('\n')
+
+
+def write_array(documents, output):
+    """Write documents as elements of a single JSON array."""
+    output.write('[')
+    for index, document in enumerate(documents):
+        if index:
+            output.write(',\n')
+        output.write(json.dumps(document, separators=(',', ':')))
+    output.write(']\n')
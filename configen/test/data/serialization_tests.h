@@ -10,4 +10,9 @@ template <class T> void CheckStringSerialization() {
   assert(deserialized.FromString(serialized));
   assert(deserialized.FromString(object.ToString()));
   assert(serialized == deserialized.ToString());
+  assert(deserialized.Hash() == object.Hash());
+  // sparse string of default object loads into a fresh instance
+  T sparse_deserialized;
+  assert(sparse_deserialized.FromString(object.ToString(true)));
+  assert(sparse_deserialized == object);
 }
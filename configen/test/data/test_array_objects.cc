@@ -1,6 +1,7 @@
 #include <cassert>
 #include <vector>
 #include <iostream>
+#include <serialization_tests.h>
 #include <inc/my_config.h>
 
 int main() {
@@ -29,5 +30,18 @@ int main() {
     assert(cfg3.an_array[i].an_int == 100);
     assert(cfg3.an_array[i].number == i);
   }
+  // elements of the array default
+  assert(cfg.peers.size() == 2);
+  assert(cfg.peers[0].host == "a" && cfg.peers[0].weight == 5);
+  assert(cfg.peers[1].host == "b" && cfg.peers[1].weight == 1);
+  CheckStringSerialization<config::AnObject>();
+  // sparse elements are relative to the element prototype, not the default
+  cfg.peers.resize(1);
+  cfg.peers[0] = config::AnObject::PeersElement();
+  config::AnObject cfg4;
+  assert(cfg4.FromString(cfg.ToString(true)));
+  assert(cfg4.peers.size() == 1);
+  assert(cfg4.peers[0].host == "localhost" && cfg4.peers[0].weight == 1);
+  assert(cfg4 == cfg);
   return 0;
 }
@@ -6,6 +6,12 @@
 
 int main() {
   config::Config cfg;
+  // array default from schema, copied from prototype
+  assert(cfg.tags.size() == 2);
+  assert(cfg.tags[0] == "a \\\"{b}\"");
+  assert(cfg.tags[1] == "c");
+  assert(&config::Config::Prototype() == &config::Config::Prototype());
+  assert(config::Config::Prototype().tags == cfg.tags);
 
   std::vector<uint16_t> vec;
   for (int i = 0; i < 5; ++i) {
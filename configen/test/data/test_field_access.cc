@@ -0,0 +1,62 @@
+#include <cassert>
+#include <inc/my_config.h>
+
+static bool keep_scale(const config::Shape &current_value,
+                       const config::Shape &new_value) {
+  return current_value.scale == new_value.scale;
+}
+
+int main() {
+  config::Shape shape;
+  config::FieldValue field;
+  // members of the referenced object have paths of their own
+  assert(config::GetShapeField(shape, "shape.origin.x", &field));
+  assert(field.kind == config::kFieldInteger && field.integer == 50);
+  assert(config::SetShapeField(&shape, "shape.origin.x",
+                               config::FieldValue::Integer(7)));
+  assert(shape.origin.x == 7);
+  assert(config::SetShapeField(&shape, "shape.origin.label",
+                               config::FieldValue::String("q")));
+  assert(shape.origin.label == "q");
+  std::string json;
+  assert(config::GetShapeField(shape, "shape.origin.label", &json));
+  assert(json == "\"q\"");
+  // validated unless asked not to
+  assert(!config::SetShapeField(&shape, "shape.origin.x",
+                                config::FieldValue::Integer(101)));
+  assert(config::SetShapeField(&shape, "shape.origin.x",
+                               config::FieldValue::Integer(101), false));
+  assert(shape.origin.x == 101);
+  // kind must match, integers are accepted by numbers
+  assert(!config::SetShapeField(&shape, "shape.visible",
+                                config::FieldValue::Integer(0)));
+  assert(config::SetShapeField(&shape, "shape.visible",
+                               config::FieldValue::Bool(false)));
+  assert(!shape.visible);
+  assert(config::SetShapeField(&shape, "shape.scale",
+                               config::FieldValue::Integer(2)));
+  assert(shape.scale == 2.0);
+  assert(config::GetShapeField(shape, "shape.scale", &field));
+  assert(field.kind == config::kFieldNumber && field.number == 2.0);
+  // values out of the member type are refused
+  assert(!config::SetShapeField(&shape, "shape.origin.x",
+                                config::FieldValue::Integer(1LL << 40), false));
+  // objects and arrays only through json
+  assert(!config::GetShapeField(shape, "shape.origin", &field));
+  assert(!config::SetShapeField(&shape, "shape.sides",
+                                config::FieldValue::Integer(1)));
+  assert(config::FindShapeField("shape.sides", 11)->kind
+         == config::kFieldOther);
+  assert(config::SetShapeField(&shape, "shape.sides", "[3]"));
+  assert(shape.sides.size() == 1 && shape.sides[0] == 3);
+  assert(!config::GetShapeField(shape, "shape.nothing", &field));
+  // pre_update decides as for whole objects
+  shape.pre_update = keep_scale;
+  assert(!config::SetShapeField(&shape, "shape.scale",
+                                config::FieldValue::Number(3.0)));
+  assert(shape.scale == 2.0);
+  assert(config::SetShapeField(&shape, "shape.origin.x",
+                               config::FieldValue::Integer(9)));
+  assert(shape.origin.x == 9);
+  return 0;
+}
@@ -0,0 +1,13 @@
+#include <cassert>
+#include <serialization_tests.h>
+#include <inc/my_config.h>
+
+int main() {
+  // types named like the hash helpers still get their own Hash<Type>
+  CheckStringSerialization<config::Cfg>();
+  config::Cfg a, b;
+  b.label = "y";
+  assert(a.Hash() != b.Hash());
+  assert(config::HashString(a.name) == config::HashBytes(a.name));
+  return 0;
+}
@@ -0,0 +1,71 @@
+#include <cassert>
+#include <string>
+#include <serialization_tests.h>
+#include <inc/my_config.h>
+
+typedef config::Service Service;
+
+int main() {
+  CheckStringSerialization<Service>();
+  Service cfg;
+  // not assigned lazy members are the prototype
+  assert(cfg.overrides.IsLoaded());
+  assert(cfg.overrides.Get().limit == 10);
+  assert(cfg.tenants.Get().empty());
+  std::string serialized =
+      "{\"service\":{\"name\":\"a\",\"overrides\":{\"limit\":20},"
+      "\"tenants\":[\"x\",\"y\"]}}";
+  assert(cfg.FromString(serialized));
+  assert(cfg.name == "a");
+  assert(!cfg.overrides.IsLoaded());
+  assert(!cfg.tenants.IsLoaded());
+  // kept nodes are written back without conversion
+  assert(cfg.ToString() == serialized);
+  assert(!cfg.overrides.IsLoaded());
+  // copies keep the node too
+  Service copy = cfg;
+  assert(!copy.overrides.IsLoaded());
+  assert(cfg.overrides.Get().limit == 20);
+  assert(cfg.overrides.Get().owner == "root");
+  assert(cfg.overrides.IsLoaded());
+  assert(cfg.tenants.Get().size() == 2 && cfg.tenants.Get()[1] == "y");
+  assert(copy == cfg);
+  assert(copy.Hash() == cfg.Hash());
+  // converted values are written with all members
+  Service reloaded;
+  assert(reloaded.FromString(cfg.ToString()));
+  assert(reloaded == cfg);
+  cfg.overrides.Mutable()->limit = 30;
+  assert(copy != cfg);
+  assert(config::DiffService(copy, cfg) == Service::kDiffOverrides);
+  // reading checks only the json type of lazy members
+  assert(!cfg.FromString("{\"service\":{\"overrides\":5}}"));
+  const char invalid[] = "{\"service\":{\"overrides\":{\"limit\":1000}}}";
+  cJSON *document = cJSON_Parse(invalid);
+  assert(Service::IsJsonValid(cJSON_GetObjectItem(document, "service")));
+  // the node of the caller is copied, not taken
+  assert(copy.FromJson(cJSON_GetObjectItem(document, "service")));
+  assert(config::JsonToString(document) == invalid);
+  // unconverted members are compared as json, sparse output keeps them
+  Service first;
+  Service second;
+  assert(first.FromString(serialized) && second.FromString(serialized));
+  assert(first == second);
+  assert(config::DiffService(first, second) == 0);
+  assert(first.ToString(true) == serialized);
+  assert(!first.overrides.IsLoaded() && !second.tenants.IsLoaded());
+  // json of the same values in another order is converted to compare
+  assert(second.FromString("{\"service\":{\"overrides\":{\"owner\":\"root\","
+                           "\"limit\":20}}}"));
+  assert(first == second);
+  assert(first.overrides.IsLoaded());
+  // invalid content is found on first access
+  assert(cfg.FromString(invalid));
+  assert(!cfg.overrides.IsLoaded());
+  assert(!cfg.overrides.Load());
+  assert(!cfg.IsValid());
+  assert(cfg.overrides.Get().limit == 10);
+  cfg.overrides.Mutable()->limit = 5;
+  assert(cfg.IsValid());
+  return 0;
+}
@@ -0,0 +1,70 @@
+#include <cassert>
+#include <ctime>
+#include <iostream>
+#include <limits>
+#include <serialization_tests.h>
+#include <inc/my_config.h>
+
+typedef config::Calibration Calibration;
+
+static double SecondsPerCall(const Calibration &cfg, const std::string &serialized) {
+  const int kCalls = 20;
+  std::size_t total = 0;
+  Calibration loaded;
+  std::clock_t start = std::clock();
+  for (int i = 0; i != kCalls; ++i) {
+    assert(cfg.IsValid());
+    total += cfg.ToString().size();
+    assert(loaded.FromString(serialized));
+  }
+  assert(total > 0);
+  return double(std::clock() - start) / CLOCKS_PER_SEC / kCalls;
+}
+
+int main() {
+  CheckStringSerialization<Calibration>();
+  Calibration cfg;
+  assert(cfg.counts.size() == 3 && cfg.counts[2] == 3);
+  // elements are range checked
+  assert(cfg.IsValid());
+  cfg.gains.push_back(2.5);
+  cfg.gains.push_back(-10.0);
+  assert(cfg.IsValid());
+  cfg.gains.push_back(10.5);
+  assert(!cfg.IsValid());
+  cfg.gains.back() = std::numeric_limits<double>::quiet_NaN();
+  assert(!cfg.IsValid());
+  cfg.gains.pop_back();
+  cfg.offsets.push_back(-7);
+  cfg.offsets.push_back(1 << 30);
+  // round trip
+  Calibration loaded;
+  assert(loaded.FromString(cfg.ToString()));
+  assert(loaded == cfg);
+  // loading a shorter array into a longer one
+  assert(loaded.FromString("{\"calibration\":{\"counts\":[5],\"gains\":[]}}"));
+  assert(loaded.counts.size() == 1 && loaded.counts[0] == 5);
+  assert(loaded.gains.empty());
+  assert(loaded.offsets == cfg.offsets);
+  // json is checked element by element
+  assert(!loaded.FromString("{\"calibration\":{\"counts\":[1001]}}"));
+  assert(!loaded.FromString("{\"calibration\":{\"counts\":[]}}"));
+  assert(!loaded.FromString("{\"calibration\":{\"gains\":[1, \"x\"]}}"));
+  assert(!loaded.FromString("{\"calibration\":{\"gains\":[-11]}}"));
+  // conversion without validation fails on elements that are not numbers
+  cJSON *mixed = config::StringToJson("[1, \"x\", 3]");
+  Calibration::Gains gains;
+  assert(!Calibration::JsonToGains(mixed, &gains));
+  cJSON_Delete(mixed);
+  assert(loaded.FromString("{\"calibration\":{\"offsets\":[-5, 3]}}"));
+  assert(loaded.offsets.size() == 2 && loaded.offsets[0] == -5);
+  // benchmark: large calibration table
+  for (int i = 0; i != 200000; ++i) {
+    cfg.gains.push_back((i % 2000) / 100.0 - 10.0);
+    cfg.counts.push_back(i % 1000);
+  }
+  std::string serialized = cfg.ToString();
+  std::cout << "table " << serialized.size() << " bytes "
+            << SecondsPerCall(cfg, serialized) * 1e3 << " ms" << std::endl;
+  return 0;
+}
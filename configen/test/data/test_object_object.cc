@@ -0,0 +1,71 @@
+#include <cassert>
+#include <serialization_tests.h>
+#include <inc/my_config.h>
+
+static bool accept_main(const config::MainObject &current_value,
+                        const config::MainObject &new_value) {
+  return true;
+}
+
+static bool accept_inner(const config::MainObject::TopObject::AnObject &current_value,
+                         const config::MainObject::TopObject::AnObject &new_value) {
+  return true;
+}
+
+int main() {
+  typedef config::MainObject::TopObject TopObject;
+  typedef config::MainObject::TopObject::AnObject AnObject;
+  CheckStringSerialization<config::MainObject>();
+  config::MainObject a;
+  config::MainObject b;
+  assert(a == b);
+  assert(config::DiffMainObject(a, b) == 0);
+  assert(a.Hash() == b.Hash());
+  // change deep inside, bit of the enclosing member is set
+  b.top_object.an_object.a_number = 1.5;
+  assert(a != b);
+  assert(a.Hash() != b.Hash());
+  assert(config::DiffMainObject(a, b) == config::MainObject::kDiffTopObject);
+  assert(config::MainObject::DiffTopObject(a.top_object, b.top_object)
+         == TopObject::kDiffAnObject);
+  assert(TopObject::DiffAnObject(a.top_object.an_object, b.top_object.an_object)
+         == AnObject::kDiffANumber);
+  // both members of the innermost object
+  b.top_object.an_object.an_int = 11;
+  assert(TopObject::DiffAnObject(a.top_object.an_object, b.top_object.an_object)
+         == (AnObject::kDiffAnInt | AnObject::kDiffANumber));
+  // dotted path accessors
+  std::string json;
+  assert(config::GetMainObjectField(
+      b, "main_object.top_object.an_object.an_int", &json));
+  assert(json == "11");
+  assert(config::SetMainObjectField(
+      &b, "main_object.top_object.an_object.an_int", "12"));
+  assert(b.top_object.an_object.an_int == 12);
+  // validated unless asked not to
+  assert(!config::SetMainObjectField(
+      &b, "main_object.top_object.an_object.an_int", "1"));
+  assert(config::SetMainObjectField(
+      &b, "main_object.top_object.an_object.an_int", "1", false));
+  assert(b.top_object.an_object.an_int == 1);
+  assert(config::SetMainObjectField(
+      &b, "main_object.top_object", "{\"an_object\":{\"an_int\":20}}"));
+  assert(b.top_object.an_object.an_int == 20);
+  assert(config::GetMainObjectField(b, "main_object", &json));
+  assert(json == b.ToString().substr(15, json.size()));
+  assert(!config::GetMainObjectField(b, "main_object.top", &json));
+  assert(!config::GetMainObjectField(b, "top_object", &json));
+  assert(!config::SetMainObjectField(&b, "main_object.top_object", "{"));
+  assert(config::FindMainObjectField("main_object.top_object", 22) != NULL);
+  assert(config::FindMainObjectField("main_object.top_objectx", 22) != NULL);
+  assert(config::FindMainObjectField("main_object.top_objec", 21) == NULL);
+  // init restores defaults and keeps hooks of the object and nested objects
+  b.pre_update = accept_main;
+  b.top_object.an_object.pre_update = accept_inner;
+  config::InitMainObject(&b);
+  assert(a == b);
+  assert(b.pre_update == accept_main);
+  assert(b.top_object.an_object.pre_update == accept_inner);
+  assert(b.top_object.pre_update == NULL);
+  return 0;
+}
@@ -1,4 +1,7 @@
 #include <cassert>
+#include <cstdio>
+#include <string>
+#include <sys/stat.h>
 #include <inc/my_config.h>
 
 int main() {
@@ -7,5 +10,33 @@ int main() {
   assert(cfg.a_number == 123.123);
   cfg.an_int = 123;
   assert(cfg.an_int == 123);
+  // buffers do not have to be terminated
+  const std::string serialized = cfg.ToString();
+  config::AnObject from_buffer;
+  assert(from_buffer.FromBuffer(serialized.data(), serialized.size()));
+  assert(from_buffer == cfg);
+  assert(!from_buffer.FromBuffer(serialized.data(), serialized.size() - 1));
+  // save and load back
+  const char path[] = "configen_test_an_object.json";
+  assert(cfg.SaveToFile(path));
+  config::AnObject loaded;
+  assert(loaded.LoadFromFile(path));
+  assert(loaded == cfg);
+  // replaced files keep their mode
+  assert(chmod(path, 0640) == 0);
+  assert(cfg.SaveToFile(path));
+  struct stat info;
+  assert(stat(path, &info) == 0 && (info.st_mode & 0777) == 0640);
+  // files filling whole pages are not read past their end
+  FILE *file = std::fopen(path, "wb");
+  assert(file != NULL);
+  std::string padded = serialized + std::string(4096 - serialized.size(), ' ');
+  assert(std::fwrite(padded.data(), 1, padded.size(), file) == padded.size());
+  assert(std::fclose(file) == 0);
+  config::AnObject padded_loaded;
+  assert(padded_loaded.LoadFromFile(path));
+  assert(padded_loaded == cfg);
+  std::remove(path);
+  assert(!loaded.LoadFromFile(path));
   return 0;
 }
@@ -0,0 +1,54 @@
+#include <cassert>
+#include <cstring>
+#include <string>
+#include <vector>
+#include <serialization_tests.h>
+#include <inc/my_config.h>
+
+typedef config::AuditRecord AuditRecord;
+
+int main() {
+  CheckStringSerialization<AuditRecord>();
+  std::vector<AuditRecord> records;
+  std::vector<std::size_t> failed;
+  // record 1 is broken, record 3 does not validate, record 4 spans lines
+  // and is skipped line by line, missing members get defaults
+  std::string ndjson =
+      "{\"user\":\"alice\",\"action\":1}\n"
+      "{\"user\":\n"
+      "{\"user\":\"bob\"}\r\n"
+      "\n"
+      "{\"action\":100}\n"
+      "{\"action\":\n"
+      "2}\n"
+      "  {\"action\":3} ";
+  // buffer is not zero terminated
+  assert(config::RecordsFromNdjson(ndjson.data(), ndjson.size(),
+                                   &records, &failed) == 3);
+  assert(records.size() == 3);
+  assert(records[0].user == "alice" && records[0].action == 1);
+  assert(records[1].user == "bob" && records[1].action == 0);
+  assert(records[2].user == "nobody" && records[2].action == 3);
+  assert(failed.size() == 4);
+  assert(failed[0] == 1 && failed[1] == 3 && failed[2] == 4 && failed[3] == 5);
+  // storage of elements is reused, reused elements start from defaults
+  const AuditRecord *storage = &records[0];
+  std::string small = "{\"action\":5}\n";
+  assert(config::RecordsFromNdjson(small.c_str(), small.size() + 1,
+                                   &records, &failed) == 1);
+  assert(&records[0] == storage);
+  assert(records[0].user == "nobody" && records[0].action == 5);
+  assert(failed.empty());
+  // json array, invalid elements are skipped unless validation is off
+  std::string array = "[{\"user\":\"carol\"}, 7, {\"action\":11}]";
+  assert(config::RecordsFromJsonArray(array.data(), array.size(),
+                                      &records, &failed) == 1);
+  assert(records[0].user == "carol");
+  assert(failed.size() == 2 && failed[0] == 1 && failed[1] == 2);
+  assert(config::RecordsFromJsonArray(array.data(), array.size(),
+                                      &records, NULL, false) == 2);
+  assert(records[1].action == 11);
+  assert(config::RecordsFromJsonArray("[", 1, &records) == 0);
+  assert(records.empty());
+  return 0;
+}
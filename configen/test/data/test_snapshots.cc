@@ -0,0 +1,74 @@
+#include <cassert>
+#include <string>
+#include <pthread.h>
+#include <inc/my_config.h>
+
+typedef config::ServerHolder Holder;
+
+static Holder holder;
+static const int kGenerations = 2000;
+static const int kReaders = 4;
+
+// every published value has twice == 2 * generation, the generation in
+// its lazy details and a name of generation % 50 characters, readers never
+// see a mix of two values and never load lazy members
+static void *Read(void *) {
+  int last = 0;
+  while (last != kGenerations) {
+    Holder::Snapshot snapshot = holder.Get();
+    int generation = snapshot->generation;
+    assert(snapshot->twice == 2 * generation);
+    assert(snapshot->details.IsLoaded());
+    assert(snapshot->details.Get().generation == generation);
+    assert(snapshot->name.size() == static_cast<std::size_t>(generation % 50));
+    assert(generation >= last);
+    last = generation;
+  }
+  return NULL;
+}
+
+int main() {
+  Holder::Snapshot initial = holder.Get();
+  assert(*initial == config::Server());
+  // rejected values are not published
+  assert(!holder.Reload("{\"server\":{\"generation\":100001}}"));
+  assert(!holder.Reload("{\"server\":"));
+  assert(holder.Get()->generation == 0);
+  assert(holder.Reload(
+      "{\"server\":{\"generation\":1,\"twice\":2,\"name\":\"a\","
+      "\"details\":{\"generation\":1}}}"));
+  assert(holder.Get()->details.IsLoaded());
+  assert(holder.Get()->generation == 1);
+  // old snapshots stay valid after publishing
+  assert(initial->generation == 0);
+  Holder::Snapshot copy;
+  copy = initial;
+  initial = holder.Get();
+  assert(copy->generation == 0 && initial->generation == 1);
+  // concurrent readers while the value is published and reloaded
+  pthread_t readers[kReaders];
+  for (int i = 0; i != kReaders; ++i) {
+    assert(pthread_create(&readers[i], NULL, Read, NULL) == 0);
+  }
+  for (int generation = 2; generation <= kGenerations; ++generation) {
+    config::Server value;
+    value.generation = generation;
+    value.twice = 2 * generation;
+    value.name = std::string(generation % 50, 'x');
+    value.details.Mutable()->generation = generation;
+    if (generation % 2 == 0) {
+      // details are not loaded before publishing
+      config::Server read;
+      assert(read.FromString(value.ToString()));
+      assert(!read.details.IsLoaded());
+      holder.Publish(read);
+    } else {
+      assert(holder.Reload(value.ToString()));
+    }
+  }
+  for (int i = 0; i != kReaders; ++i) {
+    assert(pthread_join(readers[i], NULL) == 0);
+  }
+  assert(holder.Get()->generation == kGenerations);
+  return 0;
+}
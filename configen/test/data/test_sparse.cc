@@ -0,0 +1,50 @@
+#include <cassert>
+#include <ctime>
+#include <iostream>
+#include <serialization_tests.h>
+#include <inc/my_config.h>
+
+typedef config::NodeConfig NodeConfig;
+
+static double SecondsPerCall(const NodeConfig &cfg, bool sparse) {
+  const int kCalls = 20000;
+  std::size_t total = 0;
+  std::clock_t start = std::clock();
+  for (int i = 0; i != kCalls; ++i) {
+    total += cfg.ToString(sparse).size();
+  }
+  assert(total > 0);
+  return double(std::clock() - start) / CLOCKS_PER_SEC / kCalls;
+}
+
+int main() {
+  CheckStringSerialization<NodeConfig>();
+  NodeConfig cfg;
+  // only defaults, nothing but the top level name is written
+  assert(cfg.ToString(true) == "{\"node_config\":{}}");
+  // changed members are written, unchanged siblings are not
+  cfg.port = 9090;
+  cfg.limits.rate = 10.0;
+  cfg.peers.resize(2);
+  cfg.peers[1].host = "remote";
+  cfg.tags.push_back("edge");
+  std::string sparse = cfg.ToString(true);
+  std::string full = cfg.ToString();
+  assert(sparse.find("\"port\"") != std::string::npos);
+  assert(sparse.find("\"rate\"") != std::string::npos);
+  assert(sparse.find("\"name\"") == std::string::npos);
+  assert(sparse.find("\"connections\"") == std::string::npos);
+  assert(sparse.find("\"weight\"") == std::string::npos);
+  assert(sparse.size() < full.size());
+  // loading into a fresh instance restores everything
+  NodeConfig loaded;
+  assert(loaded.FromString(sparse));
+  assert(loaded == cfg);
+  assert(loaded.ToString() == full);
+  // benchmark: payload size and serialization time
+  std::cout << "full   " << full.size() << " bytes "
+            << SecondsPerCall(cfg, false) * 1e6 << " us" << std::endl;
+  std::cout << "sparse " << sparse.size() << " bytes "
+            << SecondsPerCall(cfg, true) * 1e6 << " us" << std::endl;
+  return 0;
+}
@@ -8,5 +8,13 @@ int main() {
   assert(config::ValidateAnInt(i));
   i = 2000;
   assert(config::ValidateAnInt(i) == false);
+  // hash values are part of the format and must not change between builds
+  assert(config::HashAnInt(100) ==
+         ((static_cast<uint64_t>(0x0c35bd2fUL) << 32) | 0x5a465561UL));
+  config::AString s;
+  config::InitAString(&s);
+  assert(config::HashAString(s) ==
+         ((static_cast<uint64_t>(0xf4c42ac7UL) << 32) | 0x50f22973UL));
+  assert(config::HashANumber(0.0) == config::HashANumber(-0.0));
   return 0;
 }
@@ -13,6 +13,9 @@ DEFAULT_MAIN = ['#include <inc/my_config.h>',
                 '  return 0;',
                 '}']
 
+# generation options of tests that need them
+TEST_OPTIONS = {'test_snapshots': {'snapshots': True}}
+
 def check_output(output):
     print(output.stdout.decode('utf-8'))
     if output.exit_code != 0:
@@ -34,7 +37,8 @@ def main():
         string_of_json = open(test_filename, 'r').read()
         code = cg.convert_json(string_of_json, language='c++',
                                namespace=['config'], filename=filename,
-                               include_path=include_path);
+                               include_path=include_path,
+                               options=TEST_OPTIONS.get(test_name));
         # write header, source and main
         with open(os.path.join(include_path, filename + '.h'), 'w') as header:
             header.write(code['header'])
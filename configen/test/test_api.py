@@ -0,0 +1,62 @@
+import pytest
+
+import configen.api as ca
+import configen.generate as cg
+
+_SCHEMA = {
+    'server': {'type': 'object',
+               'properties': {'port': {'type': 'integer', 'default': 80},
+                              'peer': {'$ref': 'peer'}}},
+    'peer': {'type': 'object',
+             'properties': {'host': {'type': 'string'}}},
+    'client': {'type': 'object',
+               'properties': {'retries': {'type': 'integer'}}}}
+
+
+def test_parse_families():
+    assert ca.parse_families('validate, hash') == ['validate', 'hash']
+    assert ca.parse_families('all') == list(ca.FAMILIES)
+    with pytest.raises(ValueError):
+        ca.parse_families('validate,print')
+
+
+def test_closure_adds_dependencies():
+    assert ca.closure(['from_json']) == {'from_json', 'validate_json'}
+    assert ca.closure(['paths']) == {'paths', 'to_json', 'compare',
+                                     'from_json', 'validate_json',
+                                     'validate'}
+
+
+def test_resolve_propagates_to_referenced_types():
+    api = ca.resolve(_SCHEMA, ['validate'], {'server': ['hash']})
+    assert api['server'] == ['hash']
+    assert api['peer'] == ['hash', 'validate']
+    assert api['client'] == ['validate']
+    assert ca.resolve(_SCHEMA)['client'] == sorted(ca.FAMILIES)
+    with pytest.raises(ValueError):
+        ca.resolve(_SCHEMA, type_api={'unknown': []})
+
+
+def test_lazy_members_need_conversion():
+    schema = {'a': {'type': 'object',
+                    'properties': {'b': {'type': 'integer', 'lazy': True}}}}
+    assert ca.resolve(schema, [])['a'] == ['from_json', 'validate_json']
+
+
+def test_generated_code_has_only_selected_families():
+    code = cg.convert_schema_to_language(
+        _SCHEMA, 'c++', options={'api': ['to_json'],
+                                 'type_api': {'client': ['validate']}},
+        filename='config')
+    header = code['header']
+    assert 'bool ServerToJson(' in header
+    assert 'bool operator==(const Server &other) const;' in header
+    assert 'bool ValidateClient(const Client &value);' in header
+    assert 'bool ClientToJson(' not in header
+    assert 'JsonToServer' not in header
+    assert 'bool ValidateServer(' not in header
+    assert 'HashServer' not in header
+    assert 'FindServerField' not in header
+    # init and prototypes are always generated
+    assert 'void InitServer(Server *value);' in header
+    assert 'static const Server &Prototype();' in header
@@ -0,0 +1,84 @@
+import json
+
+import pytest
+
+import configen.generate as cg
+import configen.library as cl
+import configen.sample as cs
+import configen.validate as cv
+
+_LIBRARY_SCHEMA = {
+    'port': {'type': 'integer', 'default': 80, 'minimum': 1,
+             'maximum': 65535},
+    'endpoint': {'type': 'object',
+                 'properties': {'host': {'type': 'string'},
+                                'port': {'$ref': 'port'}}}}
+
+_SCHEMA = {
+    'service': {'type': 'object',
+                'properties': {
+                    'main': {'$ref': 'common#endpoint'},
+                    'backups': {'type': 'array',
+                                'items': {'$ref': 'common#endpoint'}}}}}
+
+
+def _library(tmp_path):
+    with open(str(tmp_path / 'common.json'), 'w') as schema_file:
+        json.dump(_LIBRARY_SCHEMA, schema_file)
+    manifest = str(tmp_path / 'common.library.json')
+    cl.write_manifest(manifest, 'common', ['company', 'common'],
+                      'common/types.h', str(tmp_path / 'common.json'))
+    return cl.load_library(manifest)
+
+
+def test_manifest_round_trip(tmp_path):
+    library = _library(tmp_path)
+    assert library == {'name': 'common', 'namespace': ['company', 'common'],
+                       'header': 'common/types.h', 'schema': _LIBRARY_SCHEMA}
+
+
+def test_references_to_library_types_are_not_generated(tmp_path):
+    code = cg.convert_schema_to_language(
+        _SCHEMA, 'c++', options={'libraries': [_library(tmp_path)]},
+        filename='service')
+    assert '#include <common/types.h>' in code['header']
+    assert 'company::common::Endpoint main;' in code['header']
+    assert 'typedef std::vector<company::common::Endpoint> Backups;' \
+        in code['header']
+    assert 'company::common::JsonToEndpoint(' in code['source']
+    # library types are only referenced
+    assert 'struct Endpoint' not in code['header']
+    assert 'ValidatePort(' not in code['header']
+
+
+def test_library_namespace_must_differ(tmp_path):
+    library = _library(tmp_path)
+    with pytest.raises(ValueError) as error:
+        cg.convert_schema_to_language(
+            _SCHEMA, 'c++', options={'libraries': [library]},
+            namespace=['company', 'common'])
+    assert 'same namespace "company::common"' in str(error.value)
+    other = dict(library, name='other')
+    with pytest.raises(ValueError):
+        cg.convert_schema_to_language(
+            _SCHEMA, 'c++', options={'libraries': [library, other]},
+            namespace=['service'])
+
+
+def test_unknown_library():
+    with pytest.raises(ValueError):
+        cg.convert_schema_to_language(_SCHEMA, 'c++')
+
+
+def test_validate_and_sample_resolve_library_types(tmp_path):
+    libraries = [_library(tmp_path)]
+    validators = cv.compile_validators(_SCHEMA, libraries)
+    document = {'service': {'main': {'port': 0}, 'backups': [{'host': 1}]}}
+    assert cv.validate_document(validators, document) == [
+        ('$.service.main.port', '0 is less than minimum 1'),
+        ('$.service.backups[0].host', 'expected string, got number')]
+    for document in cs.sample_documents(_SCHEMA, 20, seed=1,
+                                        libraries=libraries):
+        assert cv.validate_document(validators, document) == []
+    with pytest.raises(ValueError):
+        cv.compile_validators(_SCHEMA)
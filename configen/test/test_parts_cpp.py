@@ -1 +1,75 @@
 import configen.parts_cpp as cpc
+
+
+def test_object_diff_bits_follow_schema_order():
+    bits = cpc.object_diff_bits_declaration(['an_int', 'a_number'])
+    assert bits == [
+        'static const uint64_t kDiffAnInt = static_cast<uint64_t>(1) << 0;',
+        'static const uint64_t kDiffANumber = static_cast<uint64_t>(1) << 1;']
+
+
+def test_instrument_definitions_marks_json_functions():
+    definitions = cpc.variable_validate_definition({'type': 'integer'})
+    instrumented = cpc.instrument_definitions(definitions)
+    assert instrumented[1] == \
+        '  CONFIGEN_INSTRUMENT("Validate", "{namespace}{typename}");'
+    json_start = instrumented.index(
+        'bool {namespace}Validate{typename}(const cJSON *node) {lb}')
+    assert instrumented[json_start + 1:json_start + 3] == [
+        '  CONFIGEN_INSTRUMENT("ValidateJson", "{namespace}{typename}");',
+        '  CONFIGEN_INSTRUMENT_NODES(1);']
+
+
+def test_snapshot_holders_only_for_top_level_objects():
+    import json
+    import configen.generate as cg
+    schema = {'an_int': {'type': 'integer'},
+              'an_object': {'type': 'object',
+                            'properties': {'avar': {'$ref': 'an_int'}}}}
+    header = cg.convert_json(json.dumps(schema), language='c++',
+                             options={'snapshots': True})['header']
+    assert 'typedef SnapshotHolder<AnObject> AnObjectHolder;' in header
+    assert 'AnIntHolder' not in header
+
+
+def test_numeric_arrays_are_converted_in_bulk():
+    numbers = {'type': 'array', 'items': {'type': 'number', 'minimum': 0}}
+    assert cpc.is_numeric_array(numbers)
+    assert not cpc.is_numeric_array({'type': 'array',
+                                     'items': {'$ref': 'an_int'}})
+    definitions = '\n'.join(
+        cpc.numeric_array_validate_definition(numbers)
+        + cpc.numeric_array_conversion_definition(numbers))
+    assert 'invalid += (data[i] >= 0) ? 0.0 : 1.0;' in definitions
+    assert 'cJSON_CreateDoubleArray(&value[0]' in definitions
+    assert 'if (child->type != cJSON_Number) return false;' in definitions
+    # element functions are not called
+    assert 'Element' not in definitions
+    integers = {'type': 'array', 'items': {'type': 'integer'}}
+    assert 'cJSON_CreateIntArray(&value[0]' in '\n'.join(
+        cpc.numeric_array_conversion_definition(integers))
+
+
+def test_paths_include_members_of_referenced_objects():
+    import os
+    import configen.generate as cg
+    with open(os.path.join(os.path.dirname(__file__), 'data',
+                           'test_field_access.json')) as schema_file:
+        source = cg.convert_json(schema_file.read(), language='c++')['source']
+    assert ('{"shape.origin.x", kFieldInteger, &ShapeField2Get, '
+            '&ShapeField2Set,') in source
+    assert '{"shape.sides", kFieldOther, NULL, NULL,' in source
+    assert 'value->origin.label = member;' in source
+
+
+def test_objects_with_many_members_have_no_diff():
+    import json
+    import configen.generate as cg
+    schema = {'wide': {'type': 'object', 'properties': dict(
+        ('member_{0}'.format(i), {'type': 'integer'}) for i in range(65))}}
+    for options in [{}, {'api': ['to_json']}]:
+        header = cg.convert_json(json.dumps(schema), language='c++',
+                                 options=options)['header']
+        assert 'bool operator==(const Wide &other) const;' in header
+        assert 'DiffWide' not in header
+        assert 'kDiff' not in header
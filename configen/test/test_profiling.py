@@ -0,0 +1,38 @@
+import json
+
+import configen.generate as cg
+import configen.profiling as cp
+
+
+def test_profile_records_phases_and_type_sizes():
+    schema = {'an_int': {'type': 'integer', 'default': 1}}
+    profile = cp.Profile()
+    cg.convert_json(json.dumps(schema), language='c++', profile=profile)
+    assert [name for name, _ in profile.phases] == [
+        'load json', 'convert_schema an_int', 'generate_header',
+        'generate_source']
+    # init, two validates, two conversions and hash
+    assert profile.types['an_int']['functions'] == 6
+    assert profile.types['an_int']['lines'] > 0
+    assert 'an_int' in profile.report()
+
+
+def test_profile_counts_path_accessors_of_objects():
+    schema = {'main': {'type': 'object', 'properties': {
+        'a': {'type': 'integer', 'default': 1},
+        's': {'type': 'string', 'default': ''}}}}
+    profile = cp.Profile()
+    cg.convert_json(json.dumps(schema), language='c++', profile=profile)
+    # 6 functions of each member; constructor, prototype, init, two
+    # validates, two conversions, comparison, diff and hash of the
+    # object; json and typed accessors of three paths and five path
+    # functions, blocks inside functions are not counted
+    assert profile.types['main']['functions'] == 37
+    without_paths = cp.Profile()
+    cg.convert_json(json.dumps(schema), language='c++',
+                    profile=without_paths,
+                    options={'api': ['validate', 'validate_json', 'to_json',
+                                     'from_json', 'compare', 'hash']})
+    assert without_paths.types['main']['functions'] == 22
+    assert (without_paths.types['main']['bytes']
+            < profile.types['main']['bytes'])
@@ -0,0 +1,98 @@
+import io
+import json
+import os.path
+
+import configen.sample as cs
+import configen.validate as cv
+
+_TEST_PATH = os.path.join(os.path.dirname(__file__), 'data')
+
+
+def _load_schema(name):
+    with open(os.path.join(_TEST_PATH, name)) as schema_file:
+        return json.load(schema_file)
+
+
+def test_sample_documents_are_valid_and_reproducible():
+    for name in ['test_schema.json', 'test_array_variables.json',
+                 'test_object_object.json', 'test_lazy.json']:
+        schema = _load_schema(name)
+        validators = cv.compile_validators(schema)
+        documents = list(cs.sample_documents(schema, 50, seed=1))
+        assert documents == list(cs.sample_documents(schema, 50, seed=1))
+        for document in documents:
+            assert set(document) == set(schema)
+            assert cv.validate_document(validators, document) == []
+
+
+def test_sample_invalid_documents_break_rules():
+    schema = _load_schema('test_schema.json')
+    validators = cv.compile_validators(schema)
+    documents = cs.sample_documents(schema, 200, seed=2, type_name='config',
+                                    invalid_ratio=1.0)
+    for document in documents:
+        assert list(document) == ['config']
+        assert cv.validate_document(validators, document) != []
+
+
+def test_sample_honors_ranges_and_defaults():
+    schema = {'value': {'type': 'integer', 'minimum': 10.5, 'maximum': 12},
+              'flags': {'type': 'array', 'minItems': 2, 'maxItems': 3,
+                        'items': {'type': 'bool', 'default': True}}}
+    documents = list(cs.sample_documents(schema, 100, seed=3))
+    assert set(document['value'] for document in documents) == {11, 12}
+    assert all(2 <= len(document['flags']) <= 3 for document in documents)
+    assert any(flag is False for document in documents
+               for flag in document['flags'])
+
+
+def test_write_formats():
+    documents = [{'a': 1}, {'a': 2}]
+    output = io.StringIO()
+    cs.write_ndjson(documents, output)
+    assert output.getvalue() == '{"a":1}\n{"a":2}\n'
+    output = io.StringIO()
+    cs.write_array(documents, output)
+    assert json.loads(output.getvalue()) == documents
+
+
+def test_sample_integers_fit_generated_type():
+    import configen.parts_cpp as cpc
+    schema = {'low': {'type': 'integer', 'minimum': 10},
+              'high': {'type': 'integer', 'maximum': -5},
+              'full': {'type': 'integer', 'minimum': 0, 'maximum': 255},
+              'wide': {'type': 'integer', 'minimum': 0,
+                       'maximum': 2 ** 40}}
+    validators = cv.compile_validators(schema)
+    limits = {name: cpc.integer_limits(variable)
+              for name, variable in schema.items()}
+    assert limits['low'] == (0, 255)
+    for invalid_ratio in (0.0, 1.0):
+        for document in cs.sample_documents(schema, 300, seed=1,
+                                            invalid_ratio=invalid_ratio):
+            for name, value in document.items():
+                if not isinstance(value, int):
+                    continue
+                low, high = limits[name]
+                assert low <= value <= high and abs(value) < 2 ** 31
+            if invalid_ratio:
+                assert cv.validate_document(validators, document) != []
+
+
+def test_sample_resolves_members_of_objects():
+    schema = {'point': {'type': 'object', 'properties': {
+                  'x': {'type': 'integer', 'minimum': 0, 'maximum': 10}}},
+              'line': {'type': 'object', 'properties': {
+                  'start_x': {'$ref': 'point.x'},
+                  'points': {'type': 'array',
+                             'items': {'$ref': 'point'}}}},
+              'path': {'type': 'object', 'properties': {
+                  'points': {'$ref': 'line.points'}}}}
+    validators = cv.compile_validators(schema)
+    for document in cs.sample_documents(schema, 50, seed=3):
+        assert 0 <= document['line']['start_x'] <= 10
+        assert cv.validate_document(validators, document) == []
+    documents = cs.sample_documents(schema, 50, seed=4, type_name='line',
+                                    invalid_ratio=1.0)
+    assert all(cv.validate_document(validators, document) != []
+               for document in documents)
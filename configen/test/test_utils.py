@@ -8,3 +8,19 @@ def test_camel_case():
     assert cu.to_camel_case('test_var') == 'TestVar'
     assert cu.to_camel_case('Test_Var') == 'TestVar'
     assert cu.to_camel_case('TestVar') == 'TestVar'
+
+
+def test_fnv1a_64():
+    assert cu.fnv1a_64(b'') == cu.FNV_BASIS
+    assert cu.fnv1a_64(b'a') == 0xaf63dc4c8601ec8c
+
+
+def test_perfect_hash():
+    for count in [1, 2, 5, 100]:
+        keys = ['object.member_{0}.value'.format(i) for i in range(count)]
+        seeds, slots = cu.perfect_hash(keys)
+        assert len(slots) == count
+        for index, key in enumerate(keys):
+            hash = cu.fnv1a_64(key.encode('utf-8'))
+            seed = seeds[cu.mix64(hash) % len(seeds)]
+            assert slots[cu.mix64(hash ^ seed) % len(slots)] == index
@@ -0,0 +1,66 @@
+import json
+import os.path
+
+import pytest
+
+import configen.validate as cv
+
+_TEST_PATH = os.path.join(os.path.dirname(__file__), 'data')
+
+
+def _load_schema(name):
+    with open(os.path.join(_TEST_PATH, name)) as schema_file:
+        return json.load(schema_file)
+
+
+def test_validate_document_reports_json_paths():
+    validators = cv.compile_validators(_load_schema('test_schema.json'))
+    document = {'config': {'modules': [{'small_val': 100, 'big_val': 1},
+                                       {'small_val': 5, 'big_val': 'x'}]}}
+    assert cv.validate_document(validators, document) == [
+        ('$.config.modules[1].small_val', '5 is less than minimum 10'),
+        ('$.config.modules[1].big_val', 'expected number, got string')]
+    # integers are truncated and unknown members ignored like in c++
+    document = {'config': {'modules': [{'small_val': 10.5, 'other': 1}]}}
+    assert cv.validate_document(validators, document) == []
+
+
+def test_validate_array_length_and_types():
+    validators = cv.compile_validators(_load_schema('test_array_variables.json'))
+    document = {'config': {'modules': [[100] * 11, [True]]}}
+    assert cv.validate_document(validators, document, 'config') == [
+        ('$.config.modules[0]', '11 items, maxItems is 10'),
+        ('$.config.modules[1][0]', 'expected number, got bool')]
+
+
+def test_validate_files_in_workers(tmp_path):
+    filenames = []
+    for index, small_val in enumerate([100, 1]):
+        filename = str(tmp_path / '{0}.json'.format(index))
+        with open(filename, 'w') as document:
+            json.dump({'small_int': small_val}, document)
+        filenames.append(filename)
+    results = list(cv.validate_files(_load_schema('test_schema.json'),
+                                     filenames, processes=2, chunksize=1))
+    assert results == [(filenames[0], []),
+                       (filenames[1], [('$.small_int',
+                                        '1 is less than minimum 10')])]
+
+
+def test_validate_resolves_members_of_objects():
+    schema = {'point': {'type': 'object', 'properties': {
+                  'x': {'type': 'integer', 'minimum': 0, 'maximum': 10}}},
+              'line': {'type': 'object', 'properties': {
+                  'start_x': {'$ref': 'point.x'},
+                  'points': {'type': 'array',
+                             'items': {'$ref': 'point'}}}},
+              'path': {'type': 'object', 'properties': {
+                  'points': {'$ref': 'line.points'}}}}
+    validators = cv.compile_validators(schema)
+    document = {'line': {'start_x': 11}, 'path': {'points': [{'x': -1}]}}
+    assert cv.validate_document(validators, document) == [
+        ('$.line.start_x', '11 is greater than maximum 10'),
+        ('$.path.points[0].x', '-1 is less than minimum 0')]
+    schema['line']['properties']['start_x'] = {'$ref': 'point.y'}
+    with pytest.raises(ValueError):
+        cv.compile_validators(schema)
@@ -0,0 +1,61 @@
+import json
+import os
+
+import configen.watch as cw
+
+
+def _write_schema(path, schema):
+    with open(path, 'w') as schema_file:
+        json.dump(schema, schema_file)
+    # make sure the change is noticed on filesystems with coarse mtime
+    stat = os.stat(path)
+    os.utime(path, (stat.st_atime, stat.st_mtime + 1))
+
+
+def test_watcher_rewrites_only_changed_outputs(tmp_path):
+    schema_path = str(tmp_path / 'schema.json')
+    output = str(tmp_path / 'my_config')
+    schema = {'an_int': {'type': 'integer', 'default': 1},
+              'a_number': {'type': 'number', 'default': 1.5}}
+    _write_schema(schema_path, schema)
+    messages = []
+    watcher = cw.Watcher([{'input': schema_path, 'output': output}],
+                         log=messages.append)
+    assert sorted(watcher.poll()) == [output + '.cc', output + '.h']
+    # nothing changed, nothing is converted or written
+    assert watcher.poll() == []
+    # source only change, one type is regenerated
+    schema['an_int']['default'] = 2
+    _write_schema(schema_path, schema)
+    assert watcher.poll() == [output + '.cc']
+    assert '1 types reused, 1 regenerated' in messages[-1]
+    # touched but identical schema, nothing is rewritten
+    _write_schema(schema_path, schema)
+    assert watcher.poll() == []
+
+
+def test_watcher_survives_bad_schema(tmp_path):
+    schema_path = str(tmp_path / 'schema.json')
+    output = str(tmp_path / 'my_config')
+    schema = {'an_int': {'type': 'integer', 'default': 1}}
+    _write_schema(schema_path, schema)
+    messages = []
+    watcher = cw.Watcher([{'input': schema_path, 'output': output}],
+                         log=messages.append)
+    assert len(watcher.poll()) == 2
+    with open(output + '.h') as header:
+        good_header = header.read()
+    # typo in a type name and a schema that is not an object
+    for bad_schema in ({'an_int': {'type': 'intger'},
+                        'obj': {'type': 'object',
+                                'properties': {'a': {'type': 'intger'}}}},
+                       [1, 2]):
+        _write_schema(schema_path, bad_schema)
+        assert watcher.poll() == []
+        assert messages[-2].startswith('Error: failed to generate')
+        with open(output + '.h') as header:
+            assert header.read() == good_header
+    # fixed schema is generated again
+    schema['an_int']['default'] = 2
+    _write_schema(schema_path, schema)
+    assert watcher.poll() == [output + '.cc']
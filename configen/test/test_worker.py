@@ -0,0 +1,75 @@
+import io
+import json
+import os
+
+import configen.worker as cwk
+
+
+def _write_schema(path, schema):
+    with open(path, 'w') as schema_file:
+        json.dump(schema, schema_file)
+    # make sure the change is noticed on filesystems with coarse mtime
+    stat = os.stat(path)
+    os.utime(path, (stat.st_atime, stat.st_mtime + 1))
+
+
+def test_worker_serves_requests_from_memory(tmp_path):
+    schema_path = str(tmp_path / 'schema.json')
+    schema = {'an_int': {'type': 'integer', 'default': 1},
+              'a_number': {'type': 'number', 'default': 1.5}}
+    _write_schema(schema_path, schema)
+    first = str(tmp_path / 'first')
+    second = str(tmp_path / 'second')
+    requests = [{'id': 1, 'input': schema_path, 'output': first},
+                {'id': 2, 'input': schema_path, 'output': second},
+                {'id': 3, 'input': schema_path, 'output': first}]
+    output = io.StringIO()
+    worker = cwk.Worker()
+    worker.serve(io.StringIO(u'\n'.join(json.dumps(r) for r in requests)),
+                 output)
+    responses = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert [r['id'] for r in responses] == [1, 2, 3]
+    assert responses[0]['generated'] == 2
+    assert responses[0]['written'] == [first + '.cc', first + '.h']
+    # same types in another output are not converted again
+    assert responses[1]['reused'] == 2
+    assert responses[1]['written'] == [second + '.cc', second + '.h']
+    # unchanged output is not rewritten
+    assert responses[2]['written'] == []
+    # changed schema is parsed again, only the changed type is converted
+    schema['an_int']['default'] = 2
+    _write_schema(schema_path, schema)
+    response = worker.handle({'input': schema_path, 'output': first})
+    assert (response['reused'], response['generated']) == (1, 1)
+    assert response['written'] == [first + '.cc']
+
+
+def test_worker_reports_errors_and_goes_on(tmp_path):
+    output = io.StringIO()
+    worker = cwk.Worker()
+    worker.serve(io.StringIO(u'not json\n'
+                             u'{"id": 7, "input": "missing.json", '
+                             u'"output": "x"}\n'
+                             u'{"id": 8}\n'), output)
+    responses = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert [(r['id'], r['ok']) for r in responses] == [
+        (None, False), (7, False), (8, False)]
+    assert 'missing.json' in responses[1]['error']
+
+
+def test_worker_answers_malformed_schema(tmp_path):
+    schema_path = str(tmp_path / 'schema.json')
+    _write_schema(schema_path, {'obj': {'type': 'object', 'properties': {
+        'a': {'type': 'intger'}}}})
+    output = io.StringIO()
+    worker = cwk.Worker()
+    worker.serve(io.StringIO(u'\n'.join(json.dumps(r) for r in [
+        {'id': 1, 'input': schema_path, 'output': str(tmp_path / 'x')},
+        [1, 2],
+        {'id': 3, 'input': schema_path, 'output': str(tmp_path / 'x'),
+         'options': 'not a dict'}])), output)
+    responses = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert [(r['id'], r['ok']) for r in responses] == [
+        (1, False), (None, False), (3, False)]
+    assert all(r['error'] for r in responses)
+    assert not os.path.exists(str(tmp_path / 'x.h'))
@@ -39,3 +39,59 @@ def calculate_int_bit_length_to_hold(value):
 
 def rewrite(templates_list, format_dict):
     return [t.format_map(format_dict) for t in templates_list]
+
+
+FNV_BASIS = 0xcbf29ce484222325
+_FNV_PRIME = 0x100000001b3
+
+
+def fnv1a_64(data, hash=FNV_BASIS):
+    """Hash bytes with 64 bit FNV-1a, same as generated HashBytes."""
+    for byte in data:
+        hash = ((hash ^ byte) * _FNV_PRIME) & 0xffffffffffffffff
+    return hash
+
+
+def mix64(hash):
+    """Finalize hash so every bit depends on all bits, same as MixHash."""
+    hash ^= hash >> 33
+    hash = (hash * 0xff51afd7ed558ccd) & 0xffffffffffffffff
+    hash ^= hash >> 33
+    hash = (hash * 0xc4ceb9fe1a85ec53) & 0xffffffffffffffff
+    hash ^= hash >> 33
+    return hash
+
+
+def perfect_hash(keys):
+    """Build minimal perfect hash of distinct strings (hash and displace).
+
+    Return (seeds, slots): with hash = fnv1a_64(key) the bucket of a key
+    is mix64(hash) % len(seeds), its slot is
+    mix64(hash ^ seeds[bucket]) % len(slots) and slots holds index of
+    the key in keys. Bits of FNV-1a depend weakly on the last bytes, so
+    the hash is mixed before it is reduced.
+
+    """
+    hashes = [fnv1a_64(key.encode('utf-8')) for key in keys]
+    bucket_count = max(1, len(keys) // 2)
+    buckets = [[] for _ in range(bucket_count)]
+    for index, hash in enumerate(hashes):
+        buckets[mix64(hash) % bucket_count].append(index)
+    seeds = [0] * bucket_count
+    slots = [-1] * max(1, len(keys))
+    # place big buckets first while there are many free slots
+    for bucket in sorted(range(bucket_count), key=lambda b: -len(buckets[b])):
+        if not buckets[bucket]:
+            break
+        seed = 1
+        while True:
+            taken = [mix64(hashes[index] ^ seed) % len(slots)
+                     for index in buckets[bucket]]
+            if (len(set(taken)) == len(taken)
+                    and all(slots[slot] == -1 for slot in taken)):
+                break
+            seed += 1
+        seeds[bucket] = seed
+        for index, slot in zip(buckets[bucket], taken):
+            slots[slot] = index
+    return seeds, slots
@@ -0,0 +1,247 @@
+"""Validate JSON configs against a schema without generating code.
+
+The schema is compiled once into closures that follow the same rules
+as the generated Validate functions: type checks, minimum/maximum for
+variables, minItems/maxItems for arrays, unknown object members are
+ignored. Documents have the same layout as the one accepted by
+generated FromString: {"type_name": value}.
+
+"""
+
+import json
+import multiprocessing
+
+import configen.library as cl
+
+_NUMBER_TYPES = (int, float)
+
+
+def _is_number(value):
+    return isinstance(value, _NUMBER_TYPES) and not isinstance(value, bool)
+
+
+# json type name, check and conversion of the json value before min/max
+# check, integers are truncated like cJSON valueint
+_VARIABLE_RULES = {
+    'bool': ('bool', lambda v: isinstance(v, bool), None),
+    'integer': ('number', _is_number, int),
+    'number': ('number', _is_number, None),
+    'string': ('string', lambda v: isinstance(v, str), None)}
+
+_JSON_TYPE_NAMES = {dict: 'object', list: 'array', str: 'string',
+                    bool: 'bool', int: 'number', float: 'number',
+                    type(None): 'null'}
+
+
+def format_path(path):
+    """Convert linked path (parent, part) into JSON path string."""
+    parts = []
+    while path is not None:
+        path, part = path
+        parts.append(part)
+    return '$' + ''.join(reversed(parts))
+
+
+def _type_error(expected, value):
+    return 'expected {0}, got {1}'.format(
+        expected, _JSON_TYPE_NAMES.get(type(value), 'unknown'))
+
+
+def _compile_variable(schema):
+    expected, is_type, convert = _VARIABLE_RULES[schema['type']]
+    minimum = schema.get('minimum')
+    maximum = schema.get('maximum')
+
+    def check(value, path, errors):
+        if not is_type(value):
+            errors.append((path, _type_error(expected, value)))
+            return
+        if convert is not None:
+            value = convert(value)
+        if minimum is not None and value < minimum:
+            errors.append((path, '{0} is less than minimum {1}'.format(
+                value, minimum)))
+        if maximum is not None and value > maximum:
+            errors.append((path, '{0} is greater than maximum {1}'.format(
+                value, maximum)))
+    return check
+
+
+def _compile_object(schema, validators, type_path):
+    members = tuple(
+        (name, '.' + name, compile_schema(
+            member_schema, validators, _member_path(type_path, name)))
+        for name, member_schema in schema['properties'].items())
+
+    def check(value, path, errors):
+        if not isinstance(value, dict):
+            errors.append((path, _type_error('object', value)))
+            return
+        for name, part, member_check in members:
+            if name in value:
+                member_check(value[name], (path, part), errors)
+    return check
+
+
+def _compile_array(schema, validators):
+    min_items = schema.get('minItems')
+    max_items = schema.get('maxItems')
+    element_check = compile_schema(schema['items'], validators)
+
+    def check(value, path, errors):
+        if not isinstance(value, list):
+            errors.append((path, _type_error('array', value)))
+            return
+        if min_items is not None and len(value) < min_items:
+            errors.append((path, '{0} items, minItems is {1}'.format(
+                len(value), min_items)))
+        if max_items is not None and len(value) > max_items:
+            errors.append((path, '{0} items, maxItems is {1}'.format(
+                len(value), max_items)))
+        for index, element in enumerate(value):
+            element_check(element, (path, '[{0}]'.format(index)), errors)
+    return check
+
+
+def _compile_reference(schema, validators):
+    name = schema['$ref']
+
+    def check(value, path, errors):
+        # resolved on call, referenced type may be compiled later
+        validators[name](value, path, errors)
+    return check
+
+
+def _accept_any(value, path, errors):
+    pass
+
+
+def _member_path(type_path, name):
+    return type_path + '.' + name if type_path is not None else None
+
+
+def _compile_type(schema, validators, type_path):
+    if 'type' in schema:
+        if schema['type'] in _VARIABLE_RULES:
+            return _compile_variable(schema)
+        if schema['type'] == 'object':
+            return _compile_object(schema, validators, type_path)
+        if schema['type'] == 'array':
+            return _compile_array(schema, validators)
+    if '$ref' in schema:
+        return _compile_reference(schema, validators)
+    # unknown type, same as generator that produces no code for it
+    return _accept_any
+
+
+def compile_schema(schema, validators, type_path=None):
+    """Compile schema subtree into check(value, path, errors) closure.
+
+    validators is a dict type path -> check used to resolve references,
+    members of objects are added to it under their dotted type path
+    ("object.member") when type_path of the subtree is given. Errors
+    are appended as (path, message) pairs where path is a linked
+    (parent, part) tuple, see format_path.
+
+    """
+    check = _compile_type(schema, validators, type_path)
+    if type_path is not None:
+        validators[type_path] = check
+    return check
+
+
+def collect_references(schema, references):
+    if isinstance(schema, dict):
+        if '$ref' in schema:
+            references.add(schema['$ref'])
+        for value in schema.values():
+            collect_references(value, references)
+    return references
+
+
+def compile_validators(schema, libraries=None):
+    """Compile all types, return dict type path -> check.
+
+    Members of objects are added by dotted path, types of libraries (see
+    configen.library) as "library#type".
+
+    """
+    validators = {}
+    for library in libraries or []:
+        for name, check in compile_validators(library['schema']).items():
+            validators[cl.qualified_name(library['name'], name)] = check
+    for name, object_schema in schema.items():
+        compile_schema(object_schema, validators, name)
+    unresolved = collect_references(schema, set()) - set(validators)
+    if unresolved:
+        raise ValueError('unresolved references: '
+                         + ', '.join(sorted(unresolved)))
+    return validators
+
+
+def validate_document(validators, document, type_name=None):
+    """Return list of (json path, message) for a parsed document."""
+    errors = []
+    if not isinstance(document, dict):
+        return [('$', _type_error('object', document))]
+    if type_name is not None:
+        if type_name not in document:
+            return [('$', 'missing "{0}"'.format(type_name))]
+        names = [type_name]
+    else:
+        names = [name for name in document if name in validators]
+        if not names:
+            return [('$', 'no known top level type')]
+    for name in names:
+        validators[name](document[name], (None, '.' + name), errors)
+    return [(format_path(path), message) for path, message in errors]
+
+
+def validate_file(validators, filename, type_name=None):
+    try:
+        with open(filename, 'r') as document_file:
+            document = json.load(document_file)
+    except (IOError, ValueError) as e:
+        return [('$', str(e))]
+    return validate_document(validators, document, type_name)
+
+
+# per process state of validation workers
+_worker_validators = None
+_worker_type_name = None
+
+
+def _init_worker(schema, type_name, libraries):
+    global _worker_validators, _worker_type_name
+    _worker_validators = compile_validators(schema, libraries)
+    _worker_type_name = type_name
+
+
+def _validate_in_worker(filename):
+    return filename, validate_file(_worker_validators, filename,
+                                   _worker_type_name)
+
+
+def validate_files(schema, filenames, type_name=None, processes=None,
+                   chunksize=64, libraries=None):
+    """Validate files in parallel, yield (filename, errors) in order.
+
+    The schema is compiled once per worker process. With processes=1
+    everything runs in the current process.
+
+    """
+    if processes == 1:
+        validators = compile_validators(schema, libraries)
+        for filename in filenames:
+            yield filename, validate_file(validators, filename, type_name)
+        return
+    # fail early in the parent if the schema can not be compiled
+    compile_validators(schema, libraries)
+    pool = multiprocessing.Pool(processes, _init_worker,
+                                (schema, type_name, libraries))
+    try:
+        for result in pool.imap(_validate_in_worker, filenames, chunksize):
+            yield result
+    finally:
+        pool.terminate()
+        pool.join()
@@ -0,0 +1,105 @@
+"""Regenerate code when schema files change.
+
+Schema files are polled, no platform specific notification API is
+used. Generated code of every top level type is kept in memory so only
+types whose schema changed are converted again and only output files
+whose content changed are rewritten.
+
+"""
+
+from datetime import datetime
+import json
+import os
+import time
+
+import configen.generate as cg
+
+
+class Watcher(object):
+    """Keep generated code for a set of schema files up to date.
+
+    Each job is a dict with 'input' (schema file name), 'output' (base
+    name of generated files) and optional keyword arguments for
+    convert_schema_to_language: 'namespace', 'include_path', 'includes',
+    'options'.
+
+    """
+
+    def __init__(self, jobs, language='c++', log=print):
+        self.jobs = jobs
+        self.language = language
+        self.log = log
+        # header guard stays the same for the whole session
+        self.timestamp = datetime.now()
+        self._stats = {}
+        self._caches = {}
+
+    def poll(self):
+        """Regenerate outputs of changed schemas, return written files."""
+        written = []
+        for job in self.jobs:
+            written.extend(self._poll_job(job))
+        return written
+
+    def run(self, interval=1.0):
+        """Poll until interrupted."""
+        try:
+            while True:
+                self.poll()
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            pass
+
+    def _poll_job(self, job):
+        input_filename = job['input']
+        try:
+            stat = os.stat(input_filename)
+        except OSError as e:
+            self.log('Error: ' + str(e))
+            return []
+        stat_key = (stat.st_mtime, stat.st_size)
+        if self._stats.get(input_filename) == stat_key:
+            return []
+        self._stats[input_filename] = stat_key
+        try:
+            with open(input_filename, 'r') as input_file:
+                schema = json.load(input_file)
+        except ValueError as e:
+            self.log('Error: failed to parse json ' + input_filename)
+            self.log(str(e))
+            return []
+        try:
+            written, reused = self._generate(job, schema)
+        except Exception as e:
+            # a bad edit must not end the session, old outputs are kept
+            self.log('Error: failed to generate ' + input_filename)
+            self.log('{0}: {1}'.format(type(e).__name__, e))
+            return []
+        self.log('{0}: {1} types reused, {2} regenerated, wrote {3}'.format(
+            input_filename, reused, len(schema) - reused,
+            ', '.join(written) if written else 'nothing'))
+        return written
+
+    def _generate(self, job, schema):
+        """Convert schema and write outputs, return (written, reused)."""
+        input_filename = job['input']
+        old_cache = self._caches.get(input_filename, {})
+        cache = {}
+        reused = 0
+        type_options = cg.resolve_type_options(schema, job.get('options'))
+        for name, object_schema in schema.items():
+            key = cg.schema_cache_key(self.language, object_schema,
+                                      type_options[name])
+            if key in old_cache:
+                cache[key] = old_cache[key]
+                reused += 1
+        code = cg.convert_schema_to_language(
+            schema, self.language, cache=cache, options=job.get('options'),
+            timestamp=self.timestamp,
+            filename=os.path.basename(job['output']),
+            namespace=job.get('namespace', ['config']),
+            include_path=job.get('include_path', ''),
+            includes=job.get('includes'))
+        written = cg.write_changed_files(code, self.language, job['output'])
+        self._caches[input_filename] = cache
+        return written, reused
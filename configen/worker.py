@@ -0,0 +1,117 @@
+"""Serve generation requests of a build system from one process.
+
+Requests are json objects, one per line on standard input, every
+response is one line on standard output:
+
+    {"id": 1, "input": "schema.json", "output": "gen/my_config",
+     "namespace": "company.config", "include_path": "gen",
+     "includes": [], "options": {"api": ["validate", "from_json"]},
+     "libraries": ["common.library.json"]}
+
+    {"id": 1, "ok": true, "written": ["gen/my_config.cc",
+     "gen/my_config.h"], "reused": 0, "generated": 3}
+
+Only "input" and "output" are required, "id" is copied into the
+response. A failed request gets {"id": ..., "ok": false, "error": ...}
+and the worker goes on with the next one. Parsed schemas and library
+files are kept until their modification time or size changes and
+generated code of every top level type is shared by all requests, so
+repeated and overlapping generations are served from memory.
+
+"""
+
+from datetime import datetime
+import json
+import os
+
+import configen.generate as cg
+import configen.library as cl
+
+# generated code of this many top level types is kept at most
+MAX_CACHED_TYPES = 10000
+
+
+class Worker(object):
+    """Keep parsed schemas and generated code between requests."""
+
+    def __init__(self, language='c++', max_cached_types=MAX_CACHED_TYPES):
+        self.language = language
+        self.max_cached_types = max_cached_types
+        # header guard stays the same for the whole session
+        self.timestamp = datetime.now()
+        self._files = {}
+        self._cache = {}
+
+    def load_json(self, filename):
+        """Return parsed json file, parsed again only if it changed."""
+        stat = os.stat(filename)
+        stat_key = (stat.st_mtime, stat.st_size)
+        if filename in self._files and self._files[filename][0] == stat_key:
+            return self._files[filename][1]
+        with open(filename, 'r') as json_file:
+            data = json.load(json_file)
+        self._files[filename] = (stat_key, data)
+        return data
+
+    def handle(self, request):
+        """Generate files of one request, return response dict."""
+        response = {'id': request.get('id') if isinstance(request, dict)
+                    else None}
+        try:
+            response.update(self._generate(request))
+            response['ok'] = True
+        except Exception as e:
+            # any failure belongs to this request, the worker goes on
+            response['ok'] = False
+            response['error'] = '{0}: {1}'.format(type(e).__name__, e)
+        return response
+
+    def serve(self, input_file, output_file):
+        """Answer requests until end of input."""
+        for line in input_file:
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line)
+            except ValueError as e:
+                response = {'id': None, 'ok': False,
+                            'error': 'failed to parse request: ' + str(e)}
+            else:
+                response = self.handle(request)
+            output_file.write(json.dumps(response, sort_keys=True) + '\n')
+            output_file.flush()
+
+    def _generate(self, request):
+        for field in ('input', 'output'):
+            if field not in request:
+                raise KeyError(field)
+        language = request.get('language', self.language)
+        schema = self.load_json(request['input'])
+        namespace = request.get('namespace', 'config')
+        if not isinstance(namespace, list):
+            namespace = namespace.split('.')
+        include_path = request.get('include_path', '')
+        options = dict(request.get('options', {}))
+        options['libraries'] = [
+            cl.load_library(manifest, self.load_json)
+            for manifest in request.get('libraries', [])]
+        filename = os.path.basename(request['output'])
+        if request.get('library_manifest'):
+            cl.write_manifest(
+                request['library_manifest'],
+                request.get('library_name', '.'.join(namespace)), namespace,
+                os.path.join(include_path, filename + '.h'), request['input'])
+        if len(self._cache) > self.max_cached_types:
+            self._cache.clear()
+        type_options = cg.resolve_type_options(schema, options)
+        reused = len([name for name, object_schema in schema.items()
+                      if cg.schema_cache_key(language, object_schema,
+                                             type_options[name])
+                      in self._cache])
+        code = cg.convert_schema_to_language(
+            schema, language, cache=self._cache, options=options,
+            timestamp=self.timestamp, filename=filename, namespace=namespace,
+            include_path=include_path, includes=request.get('includes'))
+        written = cg.write_changed_files(code, language, request['output'])
+        return {'written': written, 'reused': reused,
+                'generated': len(schema) - reused}